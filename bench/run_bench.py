@@ -0,0 +1,319 @@
+"""
+Headless benchmarks for CodePresenter.
+
+Generates synthetic source trees and drives the plugin through the in-memory
+sublime stand-in in bench/stubs, measuring activation, stage switches, sink
+clearing and keystroke throughput, along with peak python memory and counts
+of filesystem operations. Results are written as json so runs can be
+compared:
+
+    python bench/run_bench.py --output before.json
+    python bench/run_bench.py --output after.json --compare before.json
+
+Settings can be overridden for a run with --set, e.g.
+--set reveal_mode='"line"' --set fixture_mode='"symlink"'.
+"""
+import argparse
+import builtins
+import collections
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCH_DIR, 'stubs'), os.path.dirname(BENCH_DIR)]
+
+import sublime  # noqa: E402
+import sublime_plugin  # noqa: E402
+import codepresenter  # noqa: E402
+
+# name -> files, directory depth, stages, fixture files, fixture size (kb),
+# lines per source file
+SCENARIOS = collections.OrderedDict([
+    ('small', dict(files=10, depth=1, stages=1, fixtures=0, fixture_kb=0,
+                   lines=40)),
+    ('medium', dict(files=1000, depth=3, stages=1, fixtures=20, fixture_kb=4,
+                    lines=40)),
+    ('large', dict(files=10000, depth=4, stages=1, fixtures=100,
+                   fixture_kb=4, lines=20)),
+    ('deep', dict(files=2000, depth=16, stages=1, fixtures=0, fixture_kb=0,
+                  lines=20)),
+    ('big_fixtures', dict(files=20, depth=1, stages=1, fixtures=8,
+                          fixture_kb=16384, lines=40)),
+    ('many_stages', dict(files=2000, depth=2, stages=40, fixtures=0,
+                         fixture_kb=0, lines=40)),
+])
+
+SOURCE_LINE = "    value_%d = compute(value_%d, 'text', [1, 2, 3])  # note\n"
+
+# filesystem functions counted while a benchmark runs
+COUNTED = [
+    (os, 'walk'), (os, 'stat'), (os, 'listdir'), (os, 'makedirs'),
+    (os, 'mkdir'), (os, 'remove'), (os, 'replace'), (os, 'link'),
+    (os, 'symlink'), (shutil, 'copyfile'), (shutil, 'rmtree'),
+    (builtins, 'open'),
+]
+
+
+class FsCounter(object):
+    """ counts calls to filesystem functions while active """
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+        self.originals = []
+
+    def wrap(self, name, func):
+        def counted(*args, **kwargs):
+            with self.lock:
+                self.counts[name] += 1
+            return func(*args, **kwargs)
+        return counted
+
+    def __enter__(self):
+        for module, attr in COUNTED:
+            func = getattr(module, attr, None)
+            if func is None:
+                continue
+            self.originals.append((module, attr, func))
+            setattr(module, attr, self.wrap(attr, func))
+        return self
+
+    def __exit__(self, *exc_info):
+        for module, attr, func in self.originals:
+            setattr(module, attr, func)
+        self.originals = []
+        return False
+
+
+def measure(func):
+    """ run func, returning its seconds, peak traced memory and fs ops """
+    tracemalloc.start()
+    with FsCounter() as counter:
+        start = time.perf_counter()
+        func()
+        sublime.run_timeouts()
+        elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds': elapsed,
+        'peak_memory_bytes': peak,
+        'fs_ops': dict(counter.counts),
+    }
+
+
+def generate_tree(root, files, depth, stages, fixtures, fixture_kb, lines):
+    """ write a synthetic presentation source under root; returns the list
+        of fixture directories
+    """
+    source = os.path.join(root, 'source')
+    stage_dirs = [source] if stages == 1 else \
+        [os.path.join(source, '%02d_stage' % stage)
+         for stage in range(stages)]
+    body = ''.join([SOURCE_LINE % (line, line) for line in range(lines)])
+    per_stage = max(1, files // len(stage_dirs))
+    for stage_dir in stage_dirs:
+        for index in range(per_stage):
+            parts = ['pkg%d' % ((index // 10 + level) % 7)
+                     for level in range(depth - 1)]
+            folder = os.path.join(stage_dir, *parts)
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, 'module_%d.py' % index), 'w',
+                      encoding='utf-8') as outfile:
+                outfile.write('def function_%d():\n' % index)
+                outfile.write(body)
+
+    fixture_dirs = []
+    if fixtures:
+        fixture_dir = os.path.join(source, 'data')
+        os.makedirs(fixture_dir, exist_ok=True)
+        block = os.urandom(1024)
+        for index in range(fixtures):
+            with open(os.path.join(fixture_dir, 'blob_%d.bin' % index),
+                      'wb') as outfile:
+                for _ in range(fixture_kb):
+                    outfile.write(block)
+        fixture_dirs.append(fixture_dir)
+    return source, fixture_dirs
+
+
+def reset_editor(overrides):
+    sublime.reset()
+    sublime_plugin.reset()
+    codepresenter.CodePresenterProject.PROJECTS.clear()
+    codepresenter.INSTRUMENTS.reset()
+    cp_settings = sublime.load_settings('CodePresenter.sublime-settings')
+    for key, value in overrides.items():
+        cp_settings.set(key, value)
+    codepresenter.plugin_loaded()
+
+
+def type_keystrokes(window, keystrokes):
+    """ type into the first presenter view; returns keystrokes/second and
+        characters revealed
+    """
+    project = codepresenter.CodePresenterProject.get_project(window)
+    if not project.views:
+        return None
+    cp_view = list(project.views.values())[-1]
+    view = cp_view.view
+    start_size = view.size()
+    start = time.perf_counter()
+    for _ in range(keystrokes):
+        view.type('x')
+    elapsed = time.perf_counter() - start
+    return {
+        'keystrokes': keystrokes,
+        'seconds': elapsed,
+        'keystrokes_per_second': keystrokes / elapsed if elapsed else None,
+        'chars_revealed': view.size() - start_size,
+    }
+
+
+def run_scenario(name, params, overrides, keystrokes):
+    root = tempfile.mkdtemp(prefix='cpbench-')
+    try:
+        source, fixture_dirs = generate_tree(root, **params)
+        sink = os.path.join(root, 'sink')
+        os.makedirs(sink)
+        reset_editor(overrides)
+        window = sublime.Window({'settings': {'codepresenter': {
+            'active': True,
+            'source': source,
+            'sink': sink,
+            'fixtures': {'dirs': fixture_dirs, 'files': []},
+        }}})
+
+        result = {'params': params}
+        if params['stages'] > 1:
+            activate = lambda: (  # noqa: E731
+                window.run_command('code_presenter_reset'),
+                window.run_command('code_presenter_next_stage'))
+        else:
+            activate = lambda: window.run_command(  # noqa: E731
+                'code_presenter_activate')
+        result['activate_cold'] = measure(activate)
+        result['activate_warm'] = measure(activate)
+
+        if params['stages'] > 1:
+            switches = [measure(lambda: window.run_command(
+                'code_presenter_next_stage'))
+                for _ in range(params['stages'] - 1)]
+            seconds = [switch['seconds'] for switch in switches]
+            result['next_stage'] = {
+                'count': len(seconds),
+                'mean_seconds': sum(seconds) / len(seconds),
+                'max_seconds': max(seconds),
+                'peak_memory_bytes': max([switch['peak_memory_bytes']
+                                          for switch in switches]),
+            }
+
+        cp_settings = sublime.load_settings('CodePresenter.sublime-settings')
+        result['keystrokes_intercepted'] = type_keystrokes(window,
+                                                           keystrokes)
+        intercept = cp_settings.get('intercept_keystrokes', True)
+        cp_settings.set('intercept_keystrokes', False)
+        window.run_command('code_presenter_activate')
+        sublime.run_timeouts()
+        result['keystrokes_on_modified'] = type_keystrokes(window,
+                                                           keystrokes)
+        cp_settings.set('intercept_keystrokes', intercept)
+
+        result['clear_sink'] = measure(lambda: window.run_command(
+            'code_presenter_reset'))
+        return result
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def flatten(result, prefix=''):
+    """ numeric leaves of a result, keyed by dotted path """
+    flat = {}
+    for key, value in result.items():
+        path = prefix + key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and \
+                not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline):
+    """ print the ratio of each metric against a previous run """
+    for name, result in current['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name, None)
+        if previous is None:
+            continue
+        print('%s:' % name)
+        now, before = flatten(result), flatten(previous)
+        for path in sorted(now):
+            if path.startswith('params.') or not before.get(path):
+                continue
+            print('  %-50s %14.6g -> %14.6g  (x%.2f)' %
+                  (path, before[path], now[path], now[path] / before[path]))
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        overrides[key] = json.loads(value)
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--scenario', action='append',
+                        choices=list(SCENARIOS),
+                        help='scenario to run (default: all)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply file counts and fixture sizes')
+    parser.add_argument('--keystrokes', type=int, default=2000)
+    parser.add_argument('--set', dest='overrides', action='append',
+                        default=[], metavar='KEY=JSON',
+                        help='override a CodePresenter setting')
+    parser.add_argument('--output', help='write results to this file')
+    parser.add_argument('--compare', help='previous results to compare with')
+    args = parser.parse_args(argv)
+
+    overrides = parse_overrides(args.overrides)
+    results = {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'scale': args.scale,
+            'overrides': overrides,
+        },
+        'scenarios': collections.OrderedDict(),
+    }
+    for name in args.scenario or list(SCENARIOS):
+        params = dict(SCENARIOS[name])
+        for key in ('files', 'fixture_kb'):
+            params[key] = max(1 if params[key] else 0,
+                              int(params[key] * args.scale))
+        print('running %s...' % name, file=sys.stderr)
+        results['scenarios'][name] = run_scenario(name, params, overrides,
+                                                  args.keystrokes)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as outfile:
+            outfile.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as infile:
+            compare(results, json.load(infile))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+"""
+In-memory stand-in for the parts of the Sublime Text `sublime` module that
+CodePresenter uses, so the plugin can be driven outside the editor.
+
+Only meant for the benchmarks; it is not a faithful model of the editor.
+"""
+import json
+import os
+import re
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+TIMEOUTS = []
+CLIPBOARD = ['']
+WINDOWS = []
+SETTINGS = {}
+NEXT_ID = [0]
+
+
+def _next_id():
+    NEXT_ID[0] += 1
+    return NEXT_ID[0]
+
+
+class Region(object):
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return self.end() - self.begin()
+
+    def empty(self):
+        return self.a == self.b
+
+    def __eq__(self, other):
+        return isinstance(other, Region) and \
+            (self.a, self.b) == (other.a, other.b)
+
+    def __repr__(self):
+        return 'Region(%d, %d)' % (self.a, self.b)
+
+
+class Selection(object):
+    """ list of regions; like the real one, hands out copies """
+    def __init__(self):
+        self.regions = [Region(0)]
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __getitem__(self, index):
+        region = self.regions[index]
+        return Region(region.a, region.b)
+
+    def __iter__(self):
+        return iter([Region(region.a, region.b) for region in self.regions])
+
+    def clear(self):
+        self.regions = []
+
+    def add(self, region):
+        self.regions.append(Region(region.a, region.b))
+
+    def adjust(self, func):
+        self.regions = [Region(func(region.a), func(region.b))
+                        for region in self.regions]
+
+
+class Settings(object):
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.callbacks = {}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+        for callback in list(self.callbacks.values()):
+            callback()
+
+    def has(self, key):
+        return key in self.values
+
+    def erase(self, key):
+        self.values.pop(key, None)
+
+    def add_on_change(self, tag, callback):
+        self.callbacks[tag] = callback
+
+    def clear_on_change(self, tag):
+        self.callbacks.pop(tag, None)
+
+
+def load_settings(name):
+    """ package settings, with comments and trailing commas stripped """
+    if name not in SETTINGS:
+        values = {}
+        path = os.path.join(PACKAGE_DIR, name)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as infile:
+                text = infile.read()
+            text = re.sub(r'(?m)^\s*//.*$', '', text)
+            text = re.sub(r',(\s*[}\]])', r'\1', text)
+            values = json.loads(text)
+        SETTINGS[name] = Settings(values)
+    return SETTINGS[name]
+
+
+class Edit(object):
+    pass
+
+
+class View(object):
+    def __init__(self, window, filename=None):
+        self._id = _next_id()
+        self._window = window
+        self._filename = filename
+        self._sel = Selection()
+        self._settings = Settings()
+        self.text = ''
+        self.scratch = False
+        self.loading = filename is not None
+        self.status = {}
+        if filename is not None and os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as infile:
+                self.text = infile.read()
+
+    def id(self):
+        return self._id
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return self._filename
+
+    def retarget(self, filename):
+        self._filename = filename
+
+    def set_scratch(self, scratch):
+        self.scratch = scratch
+
+    def is_scratch(self):
+        return self.scratch
+
+    def is_loading(self):
+        return self.loading
+
+    def is_dirty(self):
+        return False
+
+    def settings(self):
+        return self._settings
+
+    def size(self):
+        return len(self.text)
+
+    def sel(self):
+        return self._sel
+
+    def substr(self, region):
+        if isinstance(region, int):
+            return self.text[region:region + 1]
+        return self.text[region.begin():region.end()]
+
+    def insert(self, edit, point, text):
+        self.text = self.text[:point] + text + self.text[point:]
+        self._sel.adjust(lambda pos: pos + len(text) if pos >= point
+                         else pos)
+        return len(text)
+
+    def erase(self, edit, region):
+        begin, end = region.begin(), region.end()
+        self.text = self.text[:begin] + self.text[end:]
+        self._sel.adjust(lambda pos: pos if pos <= begin else
+                         (begin if pos <= end else pos - (end - begin)))
+
+    def replace(self, edit, region, text):
+        self.erase(edit, region)
+        self.insert(edit, region.begin(), text)
+
+    def layout_extent(self):
+        return len(self.text)
+
+    def layout_to_text(self, extent):
+        return extent
+
+    def rowcol(self, point):
+        before = self.text[:point]
+        return before.count('\n'), len(before) - (before.rfind('\n') + 1)
+
+    def text_point(self, row, col):
+        lines = self.text.split('\n')
+        return sum([len(line) + 1 for line in lines[:row]]) + col
+
+    def line(self, point):
+        if isinstance(point, Region):
+            point = point.begin()
+        start = self.text.rfind('\n', 0, point) + 1
+        end = self.text.find('\n', point)
+        return Region(start, len(self.text) if end < 0 else end)
+
+    def show(self, *args, **kwargs):
+        pass
+
+    def set_status(self, key, value):
+        self.status[key] = value
+
+    def erase_status(self, key):
+        self.status.pop(key, None)
+
+    def run_command(self, name, args=None):
+        import sublime_plugin
+        return sublime_plugin.run_text_command(self, name, args or {})
+
+    def type(self, text):
+        """ simulate typing text at the cursor, as one keystroke """
+        import sublime_plugin
+        if sublime_plugin.intercept(self, 'insert', {'characters': text}):
+            return
+        point = self._sel[0].b
+        self.insert(None, point, text)
+        sublime_plugin.fire('on_modified', self)
+
+
+class Window(object):
+    def __init__(self, project_data=None,
+                 project_file='/tmp/stub.sublime-project'):
+        self._id = _next_id()
+        self._views = []
+        self._active = None
+        self._project_data = project_data or {}
+        self._project_file = project_file
+        self.quick_panel = None
+        self.status = None
+        WINDOWS.append(self)
+
+    def id(self):
+        return self._id
+
+    def views(self):
+        return list(self._views)
+
+    def active_view(self):
+        return self._active
+
+    def open_file(self, filename, flags=0):
+        view = self.find_open_file(filename)
+        if view is None:
+            view = View(self, filename)
+            self._views.append(view)
+
+            def finish_loading():
+                import sublime_plugin
+                view.loading = False
+                sublime_plugin.fire('on_load', view)
+            set_timeout(finish_loading)
+        self.focus_view(view)
+        return view
+
+    def find_open_file(self, filename):
+        for view in self._views:
+            if view.file_name() == filename:
+                return view
+        return None
+
+    def focus_view(self, view):
+        import sublime_plugin
+        self._active = view
+        sublime_plugin.fire('on_activated', view)
+
+    def close_view(self, view):
+        import sublime_plugin
+        if view in self._views:
+            sublime_plugin.fire('on_pre_close', view)
+            self._views.remove(view)
+            view._window = None
+            sublime_plugin.fire('on_close', view)
+        if self._active is view:
+            self._active = self._views[-1] if self._views else None
+
+    def project_data(self):
+        return json.loads(json.dumps(self._project_data))
+
+    def set_project_data(self, data):
+        self._project_data = json.loads(json.dumps(data))
+
+    def project_file_name(self):
+        return self._project_file
+
+    def show_quick_panel(self, items, on_done, *args, **kwargs):
+        self.quick_panel = (items, on_done)
+
+    def show_input_panel(self, caption, initial, on_done, on_change,
+                         on_cancel):
+        on_done(initial)
+
+    def status_message(self, message):
+        self.status = message
+
+    def run_command(self, name, args=None):
+        if name == 'close_file':
+            if self._active is not None:
+                self.close_view(self._active)
+            return
+        if name == 'close_all':
+            for view in list(self._views):
+                self.close_view(view)
+            return
+        import sublime_plugin
+        return sublime_plugin.run_window_command(self, name, args or {})
+
+
+def windows():
+    return list(WINDOWS)
+
+
+def active_window():
+    return WINDOWS[-1] if WINDOWS else None
+
+
+def set_timeout(callback, delay=0):
+    TIMEOUTS.append(callback)
+
+
+def set_timeout_async(callback, delay=0):
+    TIMEOUTS.append(callback)
+
+
+def run_timeouts(limit=None):
+    """ run queued timeouts (including ones they queue); returns how many
+        ran. stands in for the editor's event loop.
+    """
+    ran = 0
+    while TIMEOUTS and (limit is None or ran < limit):
+        TIMEOUTS.pop(0)()
+        ran += 1
+    return ran
+
+
+def status_message(message):
+    pass
+
+
+def error_message(message):
+    print(message)
+
+
+def get_clipboard(*args):
+    return CLIPBOARD[0]
+
+
+def set_clipboard(text):
+    CLIPBOARD[0] = text
+
+
+def packages_path():
+    return os.path.dirname(PACKAGE_DIR)
+
+
+def version():
+    return '4000'
+
+
+def reset():
+    """ forget all windows, settings and queued timeouts """
+    del TIMEOUTS[:]
+    del WINDOWS[:]
+    SETTINGS.clear()
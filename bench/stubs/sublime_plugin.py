@@ -0,0 +1,103 @@
+"""
+In-memory stand-in for the Sublime Text `sublime_plugin` module: command and
+listener registration, and dispatching commands and events to them.
+"""
+import re
+
+import sublime
+
+TEXT_COMMANDS = {}
+WINDOW_COMMANDS = {}
+LISTENER_CLASSES = []
+LISTENERS = {}
+WINDOW_INSTANCES = {}
+
+
+def command_name(cls):
+    """ CodePresenterInsertCommand -> code_presenter_insert """
+    name = cls.__name__
+    if name.endswith('Command'):
+        name = name[:-len('Command')]
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+
+class Registering(type):
+    def __init__(cls, name, bases, namespace):
+        super(Registering, cls).__init__(name, bases, namespace)
+        if not bases or bases[0] is object:
+            return
+        if issubclass(cls, TextCommand):
+            TEXT_COMMANDS[command_name(cls)] = cls
+        elif issubclass(cls, WindowCommand):
+            WINDOW_COMMANDS[command_name(cls)] = cls
+        elif issubclass(cls, EventListener):
+            LISTENER_CLASSES.append(cls)
+
+
+class TextCommand(object, metaclass=Registering):
+    def __init__(self, view):
+        self.view = view
+
+
+class WindowCommand(object, metaclass=Registering):
+    def __init__(self, window):
+        self.window = window
+
+
+class EventListener(object, metaclass=Registering):
+    pass
+
+
+def listeners():
+    """ listener instances, created on first use like the editor does """
+    for cls in LISTENER_CLASSES:
+        if cls not in LISTENERS:
+            LISTENERS[cls] = cls()
+        yield LISTENERS[cls]
+
+
+def fire(event, *args):
+    for listener in listeners():
+        handler = getattr(listener, event, None)
+        if handler is not None:
+            handler(*args)
+
+
+def intercept(view, name, args):
+    """ offer a text command to on_text_command; runs the replacement and
+        returns True if a listener rewrote it
+    """
+    for listener in listeners():
+        handler = getattr(listener, 'on_text_command', None)
+        if handler is not None:
+            result = handler(view, name, args)
+            if result:
+                view.run_command(result[0], result[1])
+                return True
+    return False
+
+
+def run_text_command(view, name, args):
+    cls = TEXT_COMMANDS.get(name, None)
+    if cls is None:
+        return None
+    before = view.text
+    result = cls(view).run(sublime.Edit(), **args)
+    if view.text != before:
+        fire('on_modified', view)
+    return result
+
+
+def run_window_command(window, name, args):
+    cls = WINDOW_COMMANDS.get(name, None)
+    if cls is None:
+        return None
+    key = (window.id(), name)
+    if key not in WINDOW_INSTANCES:
+        WINDOW_INSTANCES[key] = cls(window)
+    return WINDOW_INSTANCES[key].run(**args)
+
+
+def reset():
+    LISTENERS.clear()
+    WINDOW_INSTANCES.clear()
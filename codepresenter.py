@@ -3,14 +3,1167 @@ CodePresenter plugin for Sublime Text
 
 Loads a given file, and gradually reveals it as you bang on the keyboard.
 
-Known issue: banging on the 'enter' key will frequently cause macros to run,
-which this doesn't deal with nicely now. So skip enter.
+Keystrokes in presenter views are swapped for a reveal before they reach the
+buffer (see intercept_keystrokes). With that turned off, banging on the 'enter'
+key will frequently cause macros to run, which this doesn't deal with nicely.
 """
+import array
+import bisect
+import collections
+import concurrent.futures
+import difflib
+import functools
+import hashlib
+import json
+import math
+import mmap
 import os
 import shutil
 import sublime
 import sublime_plugin
 import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import cProfile
+except ImportError:
+    cProfile = None
+
+
+class PhaseTimer(object):
+    """ context manager timing one run of a phase """
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        if self.stats.enabled:
+            self.stats.record(self.name, elapsed)
+        self.stats.trace_event(self.name, self.start, elapsed)
+        return False
+
+
+class NullTimer(object):
+    """ stand-in for PhaseTimer when instrumentation is off """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class Instrumentation(object):
+    """ timings and counters for activation phases and keystrokes.
+
+        each phase keeps a count, total and max, plus a histogram with four
+        buckets per doubling of latency (in microseconds), which is what the
+        percentiles are read from. while disabled, timing costs a flag check.
+
+        while a trace is being captured, every timed run is also kept as a
+        chrome trace event, whether or not the timings are enabled.
+    """
+    BUCKETS_PER_DOUBLING = 4
+    NULL_TIMER = NullTimer()
+
+    def __init__(self):
+        self.enabled = False
+        self.trace = None
+        self.trace_origin = 0.0
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.histograms = {}
+        self.counters = collections.Counter()
+
+    def timed(self, name):
+        if not self.enabled and self.trace is None:
+            return self.NULL_TIMER
+        return PhaseTimer(self, name)
+
+    def start_trace(self):
+        self.trace_origin = time.perf_counter()
+        self.trace = []
+
+    def stop_trace(self):
+        """ stop capturing; returns the events captured """
+        events, self.trace = self.trace or [], None
+        return events
+
+    def trace_event(self, name, start, seconds):
+        trace = self.trace
+        if trace is not None:
+            trace.append({
+                'name': name,
+                'cat': 'codepresenter',
+                'ph': 'X',
+                'ts': (start - self.trace_origin) * 1e6,
+                'dur': seconds * 1e6,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+            })
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def record(self, name, seconds):
+        stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        micros = max(seconds * 1e6, 1.0)
+        bucket = int(math.log(micros, 2) * self.BUCKETS_PER_DOUBLING)
+        self.histograms.setdefault(name, collections.Counter())[bucket] += 1
+
+    def bucket_limit(self, bucket):
+        """ upper bound of a histogram bucket, in milliseconds """
+        return 2 ** (float(bucket + 1) / self.BUCKETS_PER_DOUBLING) / 1000.0
+
+    def percentile(self, name, fraction):
+        """ approximate latency (ms) below which fraction of runs fall """
+        histogram = self.histograms.get(name, None)
+        if not histogram:
+            return None
+        wanted = fraction * sum(histogram.values())
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen >= wanted:
+                return self.bucket_limit(bucket)
+        return self.bucket_limit(max(histogram))
+
+    def report(self):
+        """ everything recorded, as a json-friendly dict """
+        phases = {}
+        for name, (count, total, longest) in self.phases.items():
+            phases[name] = {
+                'count': count,
+                'total_ms': total * 1000.0,
+                'max_ms': longest * 1000.0,
+                'p50_ms': self.percentile(name, 0.5),
+                'p95_ms': self.percentile(name, 0.95),
+                'p99_ms': self.percentile(name, 0.99),
+                'histogram_ms': dict(('%.3f' % self.bucket_limit(bucket),
+                                      hits)
+                                     for bucket, hits in
+                                     sorted(self.histograms[name].items())),
+            }
+        return {
+            'enabled': self.enabled,
+            'phases': phases,
+            'counters': dict(self.counters),
+        }
+
+    def export(self, filename):
+        with open(filename, 'w', encoding='utf-8') as outfile:
+            json.dump(self.report(), outfile, indent=2, sort_keys=True)
+
+
+INSTRUMENTS = Instrumentation()
+
+
+class Profiler(object):
+    """ captures a session for offline inspection: a cProfile of the UI
+        thread (where python has cProfile) and a chrome trace of every
+        instrumented entry point, on any thread.
+    """
+    def __init__(self, instruments):
+        self.instruments = instruments
+        self.profile = None
+        self.started = None
+
+    @property
+    def active(self):
+        return self.started is not None
+
+    def start(self):
+        if self.active:
+            return
+        self.started = time.strftime('%Y%m%d-%H%M%S')
+        self.instruments.start_trace()
+        if cProfile is not None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self, directory):
+        """ stop capturing and write what was captured to directory,
+            creating it if need be; returns the files written. capturing
+            stops even if they can't be written.
+        """
+        if not self.active:
+            return []
+        events = self.instruments.stop_trace()
+        profile, self.profile = self.profile, None
+        if profile is not None:
+            profile.disable()
+        base = os.path.join(directory, 'codepresenter-%s' % self.started)
+        self.started = None
+        written = []
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if profile is not None:
+                profile.dump_stats(base + '.prof')
+                written.append(base + '.prof')
+            with open(base + '.trace.json', 'w',
+                      encoding='utf-8') as outfile:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                          outfile)
+            written.append(base + '.trace.json')
+        except OSError as exc:
+            print("CodePresenter: could not write the profile to %s: %s" %
+                  (directory, exc))
+        return written
+
+
+PROFILER = Profiler(INSTRUMENTS)
+
+
+class SettingsCache(object):
+    """ the package settings, with each value fetched from sublime once and
+        kept until the settings change
+    """
+    NAME = 'CodePresenter.sublime-settings'
+    MISSING = object()
+
+    def __init__(self):
+        self.settings = None
+        self.values = {}
+
+    def get(self, key, default=None):
+        if self.settings is None:
+            self.settings = sublime.load_settings(self.NAME)
+            self.settings.add_on_change('codepresenter-cache',
+                                        self.invalidate)
+        if key not in self.values:
+            self.values[key] = self.settings.get(key, self.MISSING)
+        value = self.values[key]
+        return default if value is self.MISSING else value
+
+    def invalidate(self):
+        self.values = {}
+
+    def reset(self):
+        """ forget the settings object as well, e.g. after a reload """
+        if self.settings is not None:
+            self.settings.clear_on_change('codepresenter-cache')
+        self.settings = None
+        self.values = {}
+
+
+SETTINGS = SettingsCache()
+
+
+def instrumented(name):
+    """ decorator timing every call of a function as the phase name """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with INSTRUMENTS.timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def plugin_loaded():
+    SETTINGS.reset()
+    cp_settings = sublime.load_settings('CodePresenter.sublime-settings')
+
+    def update_instrumentation():
+        INSTRUMENTS.enabled = cp_settings.get('instrumentation', False)
+    cp_settings.add_on_change('codepresenter-instrumentation',
+                              update_instrumentation)
+    update_instrumentation()
+
+
+# patterns describing the chunk revealed per keystroke for each reveal mode.
+# 'character' has no pattern; it reveals a single character at a time.
+REVEAL_PATTERNS = {
+    'token': r'\w+|\s+|[^\w\s]',
+    'word': r'\S+[ \t]*|\n[ \t]*|[ \t]+|\s',
+    'line': r'[^\n]*\n|[^\n]+',
+    'indent': r'\A[ \t]+|\n[ \t]+|[\s\S]',
+}
+REVEAL_MODES = ['character'] + sorted(REVEAL_PATTERNS)
+
+# where seeking back by token or line can land
+SEEK_PATTERNS = {
+    'token': r'\w+|[^\w\s]',
+    'line': r'(?m)^',
+}
+
+
+def reveal_boundaries(text, mode):
+    """ compute the offsets at which each reveal chunk of text ends.
+
+        text is either a str or, for memory mapped ascii sources, a bytes-like
+        object. returns None for character mode, where every offset is a
+        boundary and storing them would just waste memory.
+    """
+    pattern = REVEAL_PATTERNS.get(mode, None)
+    if pattern is None:
+        return None
+    if not isinstance(text, str):
+        pattern = pattern.encode('ascii')
+    return [match.end() for match in re.finditer(pattern, text)]
+
+
+def line_offsets(lines):
+    """ offset of the start of each line, and of the end of the last """
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def stage_hunks(old, new):
+    """ the changes, line by line, that turn old into new, as
+        (old start, old end, new start, new end) character offsets
+    """
+    old_lines = old.splitlines(True)
+    new_lines = new.splitlines(True)
+    old_offsets = line_offsets(old_lines)
+    new_offsets = line_offsets(new_lines)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines,
+                                      autojunk=False)
+    return [(old_offsets[i1], old_offsets[i2], new_offsets[j1],
+             new_offsets[j2])
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+            if tag != 'equal']
+
+
+def common_prefix_length(first, second):
+    """ length of the common prefix, found by bisection so the comparing is
+        done a slice at a time rather than a character at a time
+    """
+    low, high = 0, min(len(first), len(second))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[:middle] == second[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def changed_span(old, new):
+    """ (start, end, text): the single replacement of old[start:end] by text
+        that turns old into new, as small as it can be
+    """
+    start = common_prefix_length(old, new)
+    low, high = 0, min(len(old), len(new)) - start
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[len(old) - middle:] == new[len(new) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return start, len(old) - low, new[start:len(new) - low]
+
+
+def changed_spans(old, new):
+    """ the replacements (start, end, text) of old[start:end] by text that
+        turn old into new, one per changed run of lines, in order. only the
+        part between the common prefix and suffix is compared line by line.
+    """
+    start, end, text = changed_span(old, new)
+    if start == end and not text:
+        return []
+    # widen to whole lines; the text around the change is the same in both
+    start = old.rfind('\n', 0, start) + 1
+    new_end = end + len(new) - len(old)
+    line_end = old.find('\n', end)
+    if line_end >= 0:
+        new_end += line_end + 1 - end
+        end = line_end + 1
+    else:
+        new_end, end = len(new), len(old)
+    middle = new[start:new_end]
+    return [(start + old_start, start + old_end,
+             middle[new_start:new_stop])
+            for old_start, old_end, new_start, new_stop
+            in stage_hunks(old[start:end], middle)]
+
+
+def shift_offset(offset, start, end, length):
+    """ where offset ends up once start:end is replaced by length
+        characters: moved along if the edit is before it, or to the end of
+        the new text if the edit spans it
+    """
+    if offset <= start:
+        return offset
+    return max(offset + length - (end - start), start + length)
+
+
+def line_context(lines, number):
+    """ hash of a line together with the one before it """
+    previous = lines[number - 1] if number > 0 else ''
+    return '%08x' % zlib.crc32((previous + lines[number]).encode('utf-8'))
+
+
+def checkpoint_anchor(text, offset):
+    """ a position in text that can be found again after edits elsewhere in
+        it: the line and column, and a hash of the line and the one before
+    """
+    lines = text.splitlines(True) or ['']
+    starts = line_offsets(lines)
+    number = min(bisect.bisect_right(starts, offset) - 1, len(lines) - 1)
+    return {'line': number, 'column': offset - starts[number],
+            'hash': line_context(lines, number)}
+
+
+def resolve_checkpoints(text, anchors):
+    """ {name: offset} for checkpoint anchors in text. each is looked for on
+        the line it was set on, then on the nearest line with the same
+        context; ones whose line is gone are left out.
+    """
+    lines = text.splitlines(True) or ['']
+    starts = line_offsets(lines)
+    by_context = None
+    offsets = {}
+    for name, anchor in anchors.items():
+        number = anchor.get('line', 0)
+        if number >= len(lines) or \
+                line_context(lines, number) != anchor.get('hash'):
+            if by_context is None:
+                by_context = collections.defaultdict(list)
+                for other in range(len(lines)):
+                    by_context[line_context(lines, other)].append(other)
+            found = by_context.get(anchor.get('hash'), [])
+            if not found:
+                print("CodePresenter: checkpoint %s is gone, its line has "
+                      "changed" % name)
+                continue
+            number = min(found, key=lambda other: abs(other - number))
+        offsets[name] = starts[number] + min(
+            anchor.get('column', 0), len(lines[number].rstrip('\r\n')))
+    return offsets
+
+
+class SourceBuffer(object):
+    """ read-once, compact holder for the contents of a source file.
+
+        source files are decoded into a single str (which python stores
+        compactly: a byte per character for ascii). they are never memory
+        mapped, since the source may be saved shorter or replaced while it
+        is presented, and reading a mapping past the new end of the file
+        kills the process. plain ascii files in a bundle, which the plugin
+        owns, are a window on the memory mapped bundle instead; since a byte
+        offset is a character offset there, indexing and slicing stay O(1)
+        and only the slices actually revealed get decoded.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_file(cls, filename):
+        """ read a utf-8 source file. raises UnicodeDecodeError for files
+            that are not utf-8.
+        """
+        with open(filename, 'rb') as infile:
+            return cls.from_bytes(infile.read())
+
+    @classmethod
+    def from_bytes(cls, raw):
+        """ decode raw bytes, normalising newlines the way text mode would """
+        text = raw.decode('utf-8')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return cls(text)
+
+    @property
+    def mapped(self):
+        """ true if the contents are a window on a memory mapped bundle
+            rather than decoded
+        """
+        return isinstance(self.data, memoryview)
+
+    def __len__(self):
+        if self.data is None:
+            return 0
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        """ memory held for the contents: the size of the decoded str, or
+            of the mapping
+        """
+        if self.data is None:
+            return 0
+        if self.mapped:
+            return len(self.data)
+        return sys.getsizeof(self.data)
+
+    def __getitem__(self, key):
+        if self.mapped:
+            if isinstance(key, slice):
+                return bytes(self.data[key]).decode('ascii')
+            return chr(self.data[key])
+        return self.data[key]
+
+    def patch(self, start, end, text):
+        """ replace start:end with text. mapped contents are decoded into a
+            str first, since a mapping can't change size.
+        """
+        data = self.data
+        if self.mapped:
+            data = self[:]
+            self.release()
+        self.data = data[:start] + text + data[end:]
+
+    def release(self):
+        """ drop the contents; the buffer is empty afterwards """
+        if isinstance(self.data, memoryview):
+            self.data.release()
+        self.data = None
+
+
+def file_hash(filename):
+    """ sha1 of the contents of a file, read in chunks """
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_hashed(sourcefile, sinkfile):
+    """ copy a file, returning the sha1 of its contents; the copy and the
+        hash are made from a single read
+    """
+    digest = hashlib.sha1()
+    with open(sourcefile, 'rb') as infile, open(sinkfile, 'wb') as outfile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(chunk)
+            outfile.write(chunk)
+    return digest.hexdigest()
+
+
+FIXTURE_MODES = ('copy', 'hardlink', 'reflink', 'symlink')
+# linux ioctl to share the blocks of one file with another (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+
+def clone_file(sourcefile, sinkfile):
+    """ copy a file, sharing its blocks with the source where the filesystem
+        supports reflinks, and otherwise copying in the kernel with
+        copy_file_range or sendfile before falling back to a plain copy.
+    """
+    with open(sourcefile, 'rb') as infile, open(sinkfile, 'wb') as outfile:
+        infd, outfd = infile.fileno(), outfile.fileno()
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(outfd, FICLONE, infd)
+                return
+            except (IOError, OSError):
+                pass
+
+        size = os.fstat(infd).st_size
+        copied = 0
+        copy_range = getattr(os, 'copy_file_range', None)
+        if copy_range is not None:
+            try:
+                while copied < size:
+                    sent = copy_range(infd, outfd, size - copied,
+                                      copied, copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+            except OSError:
+                pass
+        if copied < size and hasattr(os, 'sendfile'):
+            try:
+                os.lseek(outfd, copied, os.SEEK_SET)
+                while copied < size:
+                    sent = os.sendfile(outfd, infd, copied, size - copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+            except OSError:
+                pass
+        if copied < size:
+            infile.seek(copied)
+            outfile.seek(copied)
+            shutil.copyfileobj(infile, outfile)
+
+
+def remove_path(path):
+    """ remove a file, link or directory if it exists. links to directories
+        are removed without touching what they point at.
+    """
+    if os.path.islink(path) or os.path.isfile(path):
+        os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def materialize_fixture(sourcefile, sinkfile, mode):
+    """ put a fixture (a file, or a whole directory in symlink mode) at
+        sinkfile using the given fixture mode. if the mode is not available
+        here, falls back to a copy. returns the mode actually used, and the
+        hash of the contents if they were copied (None otherwise).
+    """
+    # never write through an existing link into the source
+    remove_path(sinkfile)
+    newdir = os.path.dirname(sinkfile)
+    os.makedirs(newdir, exist_ok=True)
+    try:
+        if mode == 'symlink':
+            os.symlink(sourcefile, sinkfile,
+                       target_is_directory=os.path.isdir(sourcefile))
+        elif mode == 'hardlink':
+            os.link(sourcefile, sinkfile)
+        elif mode == 'reflink':
+            clone_file(sourcefile, sinkfile)
+        else:
+            return mode, copy_hashed(sourcefile, sinkfile)
+        return mode, None
+    except (OSError, NotImplementedError) as exc:
+        if mode == 'copy' or os.path.isdir(sourcefile):
+            raise
+        print("CodePresenter: could not %s fixture %s (%s), copying instead" %
+              (mode, sourcefile, exc))
+        remove_path(sinkfile)
+        return 'copy', copy_hashed(sourcefile, sinkfile)
+
+
+def set_up_fixture(sourcefile, sinkfile, mode):
+    """ materialize a fixture and return its manifest entry. meant for a
+        worker thread: copies are hashed as they are made, so nothing is
+        read again afterwards. reflinks are not hashed at all, so their
+        cost does not grow with the fixture.
+    """
+    source_stat = os.stat(sourcefile)
+    used, digest = materialize_fixture(sourcefile, sinkfile, mode)
+    if used in ('symlink', 'hardlink'):
+        return {'mode': mode, 'used': used}
+    return {
+        'mode': mode,
+        'used': used,
+        'size': source_stat.st_size,
+        'mtime': source_stat.st_mtime,
+        'hash': digest,
+        'sink_mtime': os.stat(sinkfile).st_mtime,
+    }
+
+
+class FixtureManifest(object):
+    """ record of the fixtures currently in the sink, kept in a hidden file
+        next to the sink folder.
+
+        each fixture (by path relative to the source) maps to the fixture
+        mode it was set up with and, for copies, the size, mtime and (unless
+        reflinked) hash of the source file it was copied from and the mtime
+        of the copy. a
+        fixture whose source and copy both still match is left alone, so
+        restarting a presentation does not copy everything again.
+    """
+    VERSION = 1
+
+    def __init__(self, source, sink):
+        self.source = source
+        self.sink = sink
+        self.files = {}
+
+    @property
+    def path(self):
+        sink = self.sink.rstrip(os.sep)
+        return os.path.join(os.path.dirname(sink),
+                            '.%s.codepresenter' % os.path.basename(sink))
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as infile:
+                data = json.load(infile)
+        except (IOError, OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION and \
+                data.get('source') == self.source:
+            self.files = data.get('files', {})
+
+    def save(self):
+        data = {
+            'version': self.VERSION,
+            'source': self.source,
+            'files': self.files,
+        }
+        tmpname = self.path + '.tmp'
+        with open(tmpname, 'w', encoding='utf-8') as outfile:
+            json.dump(data, outfile)
+        os.replace(tmpname, self.path)
+
+    def delete(self):
+        self.files = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def sink_files(self):
+        """ the sink paths of all fixtures in the manifest """
+        return set(os.path.join(self.sink, relpath) for relpath in self.files)
+
+    def is_current(self, relpath, sourcefile, sinkfile, mode):
+        """ true if the sink copy of a fixture is still up to date. links
+            are current as long as they point at the source. copies are only
+            stat'ed unless the source mtime moved without its size changing,
+            in which case the contents are hashed to check; reflinks have no
+            hash, and are cheaper to make again than to check.
+        """
+        entry = self.files.get(relpath, None)
+        if entry is None or entry.get('mode') != mode:
+            return False
+        if entry['used'] == 'symlink':
+            return os.path.islink(sinkfile) and \
+                os.readlink(sinkfile) == sourcefile and \
+                os.path.exists(sourcefile)
+        if entry['used'] == 'hardlink':
+            try:
+                return os.path.samefile(sourcefile, sinkfile)
+            except OSError:
+                return False
+        try:
+            source_stat = os.stat(sourcefile)
+            sink_stat = os.stat(sinkfile)
+        except OSError:
+            return False
+        if source_stat.st_size != entry['size'] or \
+                sink_stat.st_size != entry['size'] or \
+                sink_stat.st_mtime != entry['sink_mtime']:
+            return False
+        if source_stat.st_mtime != entry['mtime']:
+            if entry['hash'] is None or \
+                    file_hash(sourcefile) != entry['hash']:
+                return False
+            entry['mtime'] = source_stat.st_mtime
+        return True
+
+    def record(self, relpath, entry):
+        """ note a fixture just set up, with the entry from set_up_fixture """
+        self.files[relpath] = entry
+
+
+class IgnoreMatcher(object):
+    """ the ignore_* settings, compiled once into a single matcher """
+    CACHE = {}
+
+    def __init__(self, ignore_dirs, ignore_files, ignore_patterns):
+        self.ignore_dirs = frozenset(ignore_dirs)
+        self.ignore_files = frozenset(ignore_files)
+        self.pattern = None
+        if ignore_patterns:
+            self.pattern = re.compile('|'.join(['(?:%s)' % pattern
+                                                for pattern in
+                                                ignore_patterns]))
+
+    @classmethod
+    def from_settings(cls, cp_settings):
+        """ shared matcher for the ignore_* values in cp_settings """
+        key = (tuple(cp_settings.get('ignore_directories', [])),
+               tuple(cp_settings.get('ignore_files', [])),
+               tuple(cp_settings.get('ignore_patterns', [])))
+        if key not in cls.CACHE:
+            cls.CACHE.clear()
+            cls.CACHE[key] = cls(*key)
+        return cls.CACHE[key]
+
+    def skip_dir(self, name):
+        return name.startswith('.') or name in self.ignore_dirs
+
+    def skip_file(self, name):
+        return name.startswith('.') or name in self.ignore_files or \
+            (self.pattern is not None and
+             self.pattern.match(name) is not None)
+
+
+class FixtureMatcher(object):
+    """ fixture membership: a set of the fixture files, and a trie of the
+        fixture directories by path component, so a lookup costs the depth
+        of the path and /src/foo never matches /src/foobar.
+    """
+    def __init__(self, dirs, files):
+        self.key = (tuple(dirs), tuple(files))
+        self.files = frozenset(files)
+        self.trie = {}
+        for adir in dirs:
+            node = self.trie
+            for part in adir.rstrip(os.sep).split(os.sep):
+                node = node.setdefault(part, {})
+            # None marks the end of a fixture directory
+            node[None] = True
+
+    def __contains__(self, filename):
+        if filename in self.files:
+            return True
+        node = self.trie
+        for part in filename.split(os.sep):
+            node = node.get(part, None)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+
+class SourceTreeIndex(object):
+    """ the filtered files under the source folder, from a single walk.
+
+        the index stays valid until the mtime of a directory it walked
+        changes (a file or folder was added, removed or renamed) or the
+        ignore settings change. stage partitions and the split into fixtures
+        and presented files are derived from the one file list.
+    """
+    def __init__(self, root, matcher):
+        self.root = root
+        self.matcher = matcher
+        self.files = []
+        self.stages = collections.OrderedDict()
+        self.dir_mtimes = {}
+        self.fixture_key = None
+        self.fixtures = frozenset()
+        self.bundle = None
+
+    @classmethod
+    def from_bundle(cls, root, bundle):
+        """ index of a compiled bundle, without touching the source tree """
+        index = cls(root, None)
+        index.bundle = bundle
+        for stage in bundle.stages:
+            index.stages[os.path.join(root, stage)] = []
+        index.files = sorted([os.path.join(root, relpath)
+                              for relpath in bundle.paths])
+        return index.partition()
+
+    @instrumented('walk')
+    def build(self):
+        for root, dirs, files in os.walk(self.root):
+            INSTRUMENTS.count('dirs_walked')
+            self.dir_mtimes[root] = os.stat(root).st_mtime
+            dirs[:] = [adir for adir in dirs
+                       if not self.matcher.skip_dir(adir)]
+            if root == self.root:
+                for adir in sorted(dirs):
+                    self.stages[os.path.join(root, adir)] = []
+            self.files.extend([os.path.join(root, afile) for afile in files
+                               if not self.matcher.skip_file(afile)])
+        self.files.sort()
+        return self.partition()
+
+    def partition(self):
+        """ file the sorted files under their stages """
+        prefix_len = len(os.path.join(self.root, ''))
+        for sourcefile in self.files:
+            parts = sourcefile[prefix_len:].split(os.sep, 1)
+            if len(parts) > 1:
+                self.stages[os.path.join(self.root, parts[0])].append(
+                    sourcefile)
+        return self
+
+    @instrumented('index_check')
+    def is_valid(self, matcher):
+        if self.bundle is not None:
+            return not self.bundle.closed
+        if matcher is not self.matcher:
+            return False
+        for path, mtime in self.dir_mtimes.items():
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def files_under(self, location):
+        """ sorted source files under location """
+        location = location.rstrip(os.sep)
+        if location == self.root:
+            return self.files
+        if location in self.stages:
+            return self.stages[location]
+        prefix = location + os.sep
+        return [sourcefile for sourcefile in self.files
+                if sourcefile.startswith(prefix)]
+
+    def classify(self, matcher):
+        """ split the files into fixtures and presented files, once per
+            fixture matcher
+        """
+        if matcher is not self.fixture_key:
+            self.fixtures = frozenset([sourcefile
+                                       for sourcefile in self.files
+                                       if sourcefile in matcher])
+            self.fixture_key = matcher
+
+    def presented_under(self, location):
+        """ sorted non-fixture files under location """
+        return [sourcefile for sourcefile in self.files_under(location)
+                if sourcefile not in self.fixtures]
+
+
+# text commands that keystrokes turn into, and which are swapped for a reveal
+# in presenter views before they touch the buffer
+KEYSTROKE_COMMANDS = frozenset(['insert', 'insert_snippet',
+                                'insert_best_completion', 'paste',
+                                'run_macro_file'])
+
+
+def keystroke_count(command_name, args):
+    """ how many characters a keystroke command would have typed """
+    if command_name == 'insert':
+        return len(args.get('characters', ''))
+    if command_name == 'paste':
+        return len(sublime.get_clipboard())
+    if command_name == 'run_macro_file':
+        # the enter key runs the 'Add Line' macros in some contexts
+        return 1 if 'Add Line' in args.get('file', '') else 0
+    return 1
+
+
+class PresentationBundle(object):
+    """ a presentation compiled into a single file, so activation can
+        memory map it instead of walking and reading the source tree.
+
+        the file is MAGIC, a little endian u32 format version and u64 header
+        length, a json header, then the contents of every presented file
+        stored back to back (utf-8 with newlines normalised, optionally zlib
+        compressed per file) followed by their reveal boundaries as packed
+        unsigned ints. the header holds the source folder it was compiled
+        from, the stage table, the fixtures and, per file, where its
+        contents and boundaries are and its reveal mode. fixtures are listed
+        but not stored; they are still set up from the source, as fast
+        forward offsets are from the project.
+    """
+    MAGIC = b'CPBUNDLE'
+    VERSION = 1
+    PREAMBLE = struct.Struct('<8sIQ')
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.mapped = None
+        self.header = None
+        self.blob_start = 0
+        self.entries = {}
+
+    @property
+    def closed(self):
+        return self.mapped is None
+
+    @property
+    def stages(self):
+        return self.header['stages']
+
+    @property
+    def paths(self):
+        return list(self.entries) + self.header['fixtures']
+
+    @classmethod
+    def open(cls, path):
+        """ memory map a bundle; raises ValueError if it is not one """
+        bundle = cls(path)
+        with open(path, 'rb') as infile:
+            bundle.mtime = os.fstat(infile.fileno()).st_mtime
+            bundle.mapped = mmap.mmap(infile.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+        try:
+            magic, version, header_len = cls.PREAMBLE.unpack_from(
+                bundle.mapped)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError("%s is not a CodePresenter bundle" % path)
+            start = cls.PREAMBLE.size
+            bundle.header = json.loads(
+                bundle.mapped[start:start + header_len].decode('utf-8'))
+        except (struct.error, ValueError):
+            bundle.close()
+            raise ValueError("%s is not a CodePresenter bundle" % path)
+        bundle.blob_start = cls.PREAMBLE.size + header_len
+        bundle.entries = dict((entry['path'], entry)
+                              for entry in bundle.header['files'])
+        return bundle
+
+    def close(self):
+        if self.mapped is not None:
+            try:
+                self.mapped.close()
+            except BufferError:
+                # windows handed out to views; closed once they are released
+                pass
+            self.mapped = None
+
+    def source_buffer(self, relpath):
+        entry = self.entries[relpath]
+        start = self.blob_start + entry['start']
+        end = start + entry['length']
+        if entry['compressed']:
+            return SourceBuffer(zlib.decompress(
+                self.mapped[start:end]).decode('utf-8'))
+        if entry['ascii']:
+            return SourceBuffer(memoryview(self.mapped)[start:end])
+        return SourceBuffer(self.mapped[start:end].decode('utf-8'))
+
+    def boundaries(self, relpath, mode, source_buffer):
+        """ the stored reveal boundaries, if compiled with the same mode """
+        entry = self.entries[relpath]
+        if entry['mode'] != mode or \
+                self.header['byteorder'] != sys.byteorder:
+            return reveal_boundaries(source_buffer.data, mode)
+        if entry['bounds_count'] is None:
+            return None
+        bounds = array.array(self.header['typecode'])
+        start = self.blob_start + entry['bounds_start']
+        bounds.frombytes(self.mapped[start:start + entry['bounds_count'] *
+                                     bounds.itemsize])
+        return bounds.tolist()
+
+    @classmethod
+    def compile(cls, path, root, index, modes, compress=False):
+        """ write a bundle of the presented files in index. modes maps
+            source files to their reveal mode. raises UnicodeDecodeError
+            (with the file name added to its reason) for files that are not
+            utf-8.
+        """
+        typecode = 'I' if array.array('I').itemsize == 4 else 'L'
+        entries = []
+        chunks = []
+        position = 0
+        for sourcefile in index.files:
+            if sourcefile in index.fixtures:
+                continue
+            with open(sourcefile, 'rb') as infile:
+                raw = infile.read()
+            try:
+                text = SourceBuffer.from_bytes(raw).data
+            except UnicodeDecodeError as exc:
+                exc.reason = '%s in %s' % (exc.reason, sourcefile)
+                raise
+            data = text.encode('utf-8')
+            entry = {
+                'path': os.path.relpath(sourcefile, root),
+                'chars': len(text),
+                'ascii': len(data) == len(text),
+                'compressed': False,
+                'mode': modes[sourcefile],
+            }
+            if compress:
+                packed = zlib.compress(data)
+                if len(packed) < len(data):
+                    data = packed
+                    entry['compressed'] = True
+            entry['start'] = position
+            entry['length'] = len(data)
+            chunks.append(data)
+            position += len(data)
+
+            boundaries = reveal_boundaries(text, entry['mode'])
+            entry['bounds_start'] = position
+            entry['bounds_count'] = None
+            if boundaries is not None:
+                packed = array.array(typecode, boundaries).tobytes()
+                entry['bounds_count'] = len(boundaries)
+                chunks.append(packed)
+                position += len(packed)
+            entries.append(entry)
+
+        header = json.dumps({
+            'source': root,
+            'created': time.time(),
+            'byteorder': sys.byteorder,
+            'typecode': typecode,
+            'stages': [os.path.relpath(stage, root) for stage in index.stages],
+            'fixtures': sorted([os.path.relpath(fixture, root)
+                                for fixture in index.fixtures]),
+            'files': entries,
+        }).encode('utf-8')
+        tmpname = path + '.tmp'
+        with open(tmpname, 'wb') as outfile:
+            outfile.write(cls.PREAMBLE.pack(cls.MAGIC, cls.VERSION,
+                                            len(header)))
+            outfile.write(header)
+            for chunk in chunks:
+                outfile.write(chunk)
+        os.replace(tmpname, path)
+        return len(entries)
+
+
+class StagePrefetch(object):
+    """ reads and decodes the files of the upcoming stage on a background
+        thread, and creates their sink folders, while the current stage is
+        being presented.
+
+        jobs are (sourcefile, sinkfile, reveal mode) tuples, worked out on
+        the main thread. a prepared file is only handed out if it has not
+        changed on disk and its reveal mode is still the same.
+    """
+    def __init__(self, stage, jobs):
+        self.stage = stage
+        self.jobs = jobs
+        self.prepared = {}
+        self.cancelled = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        for sourcefile, sinkfile, mode in self.jobs:
+            if self.cancelled:
+                return
+            try:
+                os.makedirs(os.path.dirname(sinkfile), exist_ok=True)
+                source_stat = os.stat(sourcefile)
+                source_buffer = SourceBuffer.from_file(sourcefile)
+            except (OSError, UnicodeDecodeError):
+                # left for the main thread to read, and report
+                continue
+            self.prepared[sourcefile] = (
+                (source_stat.st_size, source_stat.st_mtime), mode,
+                source_buffer, reveal_boundaries(source_buffer.data, mode))
+
+    def wait(self):
+        self.thread.join()
+
+    def take(self, sourcefile, mode):
+        """ (buffer, boundaries) prepared for a source file, or None """
+        entry = self.prepared.pop(sourcefile, None)
+        if entry is None:
+            return None
+        stat_key, prepared_mode, source_buffer, boundaries = entry
+        try:
+            source_stat = os.stat(sourcefile)
+        except OSError:
+            source_stat = None
+        if source_stat is None or prepared_mode != mode or\
+                (source_stat.st_size, source_stat.st_mtime) != stat_key:
+            source_buffer.release()
+            return None
+        return source_buffer, boundaries
+
+    def cancel(self):
+        """ stop, and release anything prepared but not taken """
+        self.cancelled = True
+        self.wait()
+        for entry in self.prepared.values():
+            entry[2].release()
+        self.prepared = {}
 
 
 class CodePresenterView(object):
@@ -22,10 +1175,26 @@ class CodePresenterView(object):
         self.sink = sink
 
         self.character_source = None
+        # end offsets of the reveal chunks, None to reveal by character
+        self.boundaries = None
+        self.reveal_mode = 'character'
+        # mtime of the source file when it was read
+        self.source_mtime = None
+        # named checkpoints: name -> offset in the source
+        self.checkpoints = {}
         self.index = offset
         self.last_region = sublime.Region(offset-1, offset)
         self.last_size = None
 
+        # when revealing only what changed since the previous stage: the
+        # text of the file in that stage, the changed hunks still to come,
+        # where the one being revealed ends, and how much of the previous
+        # text follows the reveal point in the view
+        self.previous = None
+        self.hunks = None
+        self.hunk_end = None
+        self.tail = 0
+
     @property
     def done(self):
         return self.index >= len(self.character_source) +\
@@ -36,40 +1205,382 @@ class CodePresenterView(object):
         """ access to the id of the view this is using """
         return self.view.id()
 
+    def next_stop(self, count=1):
+        """ offset in the character source where the next count reveal
+            chunks end
+        """
+        if self.boundaries is None:
+            stop = self.index + count
+        else:
+            pos = bisect.bisect_right(self.boundaries, self.index) + count - 1
+            if pos >= len(self.boundaries):
+                stop = len(self.character_source)
+            else:
+                stop = self.boundaries[pos]
+        return min(stop, self.reveal_end)
+
+    @property
+    def reveal_end(self):
+        """ how far the reveal can go before the cursor has to move on """
+        if self.hunk_end is not None:
+            return self.hunk_end
+        return len(self.character_source)
+
+    @property
+    def point(self):
+        """ where in the view text is revealed """
+        return self.view.size() - self.tail
+
+    def contents(self):
+        """ what the view should hold right now """
+        text = self.character_source[:self.index]
+        if self.tail:
+            text += self.previous[len(self.previous) - self.tail:]
+        return text
+
+    def diff_from(self, previous):
+        """ reveal only what changed since previous, the text of the file in
+            the stage before: the view starts out with it, and only the
+            changed hunks are revealed, the cursor jumping from one to the next
+        """
+        self.previous = previous
+        self.hunks = collections.deque(
+            stage_hunks(previous, self.character_source[:]))
+        self.next_hunk()
+
+    def next_hunk(self, edit=None):
+        """ move on to the next changed hunk, dropping the previous stage's
+            text it replaces (from the view too, given an edit). the text up
+            to the hunk is the same in both stages, so its offset in the view
+            is its offset in the source.
+        """
+        while self.hunks:
+            old_start, old_end, new_start, new_end = self.hunks.popleft()
+            if edit is not None and old_end > old_start:
+                self.view.erase(edit, sublime.Region(
+                    new_start, new_start + old_end - old_start))
+            self.index = new_start
+            self.tail = len(self.previous) - old_end
+            if new_end > new_start:
+                self.hunk_end = new_end
+                return
+        # nothing else changed, so the rest is already in place
+        self.index = len(self.character_source)
+        self.previous = None
+        self.hunks = None
+        self.hunk_end = None
+        self.tail = 0
+
+    def starts_before(self, pattern, count=1):
+        """ offset where the count-th last match of pattern starting before
+            index begins, or 0 if there are not that many. only as much of
+            the source as it takes is searched, backwards from index.
+        """
+        end = min(self.index, len(self.character_source))
+        width = 4096
+        while True:
+            base = max(0, end - width)
+            starts = [base + match.start() for match in
+                      re.finditer(pattern, self.character_source[base:end])
+                      if base + match.start() < end]
+            if base > 0:
+                # the first match may really begin before the window
+                starts = starts[1:]
+            if len(starts) >= count:
+                return starts[-count]
+            if base == 0:
+                return 0
+            width *= 4
+
+    def end_after(self, pattern, start=None):
+        """ offset where the next match of pattern (compiled) after start
+            (by default index) ends, or None if there is none. searched
+            forwards from start as far as it takes.
+        """
+        if start is None:
+            start = self.index
+        start = min(start, len(self.character_source))
+        width = 4096
+        while True:
+            text = self.character_source[start:start + width]
+            match = pattern.search(text)
+            complete = start + width >= len(self.character_source)
+            if match is not None and (match.end() < len(text) or complete):
+                return start + match.end()
+            if complete:
+                return None
+            width *= 4
+
+    def seek(self, edit, target):
+        """ move the reveal point to target, changing only the text between
+            the old point and the new one, in a single edit
+        """
+        target = max(0, min(target, len(self.character_source)))
+        start = min(self.index, target, self.view.size())
+        self.view.replace(edit, sublime.Region(start, self.view.size()),
+                          self.character_source[start:target])
+        self.index = target
+        self.set_cursor(self.view.size())
+
+    def patch(self, edit, start, end, text):
+        """ replace start:end of the source with text, as saved to the
+            source file. the view changes only if the edit is in what has
+            been revealed; the reveal point moves with the text around it,
+            or to the end of the new text if the edit spans it. keystrokes
+            spent in the leeway past the end of a finished file are dropped,
+            so text added at the end is revealed from its start.
+        """
+        revealed = min(self.index, len(self.character_source))
+        self.character_source.patch(start, end, text)
+        if self.boundaries is not None:
+            self.boundaries = self.patch_boundaries(start, end, text)
+        if start < revealed:
+            self.view.replace(edit, sublime.Region(start, min(end, revealed)),
+                              text)
+            self.set_cursor(self.point)
+        self.index = shift_offset(revealed, start, end, len(text))
+
+    def patch_boundaries(self, start, end, text):
+        """ the reveal boundaries after start:end has been replaced by text:
+            the ones before the edit are kept, and the source is scanned
+            again from there until the chunks line up with the old ones
+        """
+        old = self.boundaries
+        delta = len(text) - (end - start)
+        kept = old[:bisect.bisect_left(old, start)]
+        pattern = re.compile(REVEAL_PATTERNS[self.reveal_mode])
+        source = self.character_source.data
+        for match in pattern.finditer(source, kept[-1] if kept else 0):
+            stop = match.end()
+            kept.append(stop)
+            if stop - delta > end:
+                # past the edit: once a boundary matches an old one, the
+                # rest are the old ones, shifted
+                pos = bisect.bisect_left(old, stop - delta)
+                if pos < len(old) and old[pos] == stop - delta:
+                    kept.extend([boundary + delta
+                                 for boundary in old[pos + 1:]])
+                    break
+        return kept
+
+    def set_cursor(self, point):
+        self.view.sel().clear()
+        self.view.sel().add(sublime.Region(point, point))
+        self.last_region = sublime.Region(point, point)
+        self.last_size = self.view.size()
+
+    def release(self):
+        """ let go of the source contents """
+        if self.character_source is not None:
+            self.character_source.release()
+            self.character_source = None
+
     def set_initial_cursor(self):
         self.view.sel().clear()
         extent = self.view.layout_extent()
-        pt = self.view.layout_to_text(extent)
+        pt = self.view.layout_to_text(extent) - self.tail
         endreg = sublime.Region(pt, pt)
         self.view.sel().add(endreg)
         self.last_region = endreg
+        self.last_size = self.view.size()
 
-    def do_edit(self, edit):
+    def do_edit(self, edit, typed=1, count=None, stop=None):
         """ do the actual edit. first erase the text that was just added
-            (last character, since this should be called for every character
-            entry) then append the next character.
-
-            if the cursor selection is *not* at the end of the file, though
-            do nothing
+            (the last typed characters, since this should be called after
+            every modification) then append count chunks of the source, as
+            determined by the reveal mode; by default one per character
+            typed. a burst of typing or a paste is replaced in a single edit.
+            keystrokes intercepted before reaching the buffer come in with
+            nothing typed. with stop, the source is revealed up to that
+            offset instead.
+
+            if the cursor selection is *not* in the typed text at the end of
+            the file, though, leave the edit alone
         """
+        if count is None:
+            count = typed
 
+        point = self.point
+        typed_region = sublime.Region(max(point - typed, 0), point)
         cursor = self.view.sel()[0]
-        cursor.a = cursor.a - 1
-        if cursor.b != self.view.size():
+        if not typed_region.a <= cursor.b <= point:
             pass
         elif self.index >= len(self.character_source):
             # this provides a little leeway to stop typing
             if not self.done:
-                self.last_region = cursor
-                self.view.erase(edit, cursor)
-                self.index += 1
+                self.last_region = typed_region
+                self.view.erase(edit, typed_region)
+                self.index += count
         else:
-            self.last_region = cursor
-            self.view.erase(edit, cursor)
-            self.view.insert(edit, self.view.size(),
-                             self.character_source[self.index])
-            self.index += 1
-            self.last_size = self.view.size()
+            if stop is None:
+                stop = self.next_stop(count)
+            stop = min(stop, self.reveal_end)
+            INSTRUMENTS.count('chars_revealed', stop - self.index)
+            self.last_region = typed_region
+            self.view.erase(edit, typed_region)
+            self.view.insert(edit, self.point,
+                             self.character_source[self.index:stop])
+            self.index = stop
+            if self.index == self.hunk_end:
+                self.next_hunk(edit)
+                self.set_cursor(self.point)
+        self.last_size = self.view.size()
+
+
+class AutoPlayback(object):
+    """ autoplay state for one presenter view """
+    LOOKAHEAD = 256
+
+    def __init__(self, cp_view, rate):
+        self.cp_view = cp_view
+        self.rate = rate
+        self.paused = False
+        # characters that have come due but not been revealed yet
+        self.owed = 0.0
+        self.last = time.time()
+        self.hold_until = 0
+
+    def due(self, now, line_pause, marker, marker_pause):
+        """ offset the view should be revealed up to by now, or None if
+            nothing is due. stops after a line end or a marker, holding
+            there for the given pause (in seconds).
+        """
+        self.owed += (now - self.last) * self.rate
+        self.last = now
+        if now < self.hold_until:
+            self.owed = 0.0
+            return None
+        count = int(self.owed)
+        if count < 1:
+            return None
+        self.owed -= count
+
+        start = self.cp_view.index
+        due = count
+        # look a little past what is due, so a marker that starts in it is
+        # found (and revealed) whole
+        text = self.cp_view.character_source[start:start + due +
+                                             self.LOOKAHEAD]
+        pause = 0
+        if line_pause > 0:
+            newline = text.find('\n', 0, due)
+            if newline >= 0:
+                due, pause = newline + 1, line_pause
+        if marker is not None:
+            match = marker.search(text)
+            if match is not None and match.start() < due and match.end() > 0:
+                due, pause = match.end(), marker_pause
+        if pause > 0:
+            self.hold_until = now + pause
+            self.owed = 0.0
+        return start + due
+
+
+class AutoPlayer(object):
+    """ reveals presenter views on a timer instead of keystrokes.
+
+        a single frame callback serves every playing view: each frame, the
+        characters that have come due for a view since the last one are
+        revealed in one insert.
+    """
+    FRAME_MS = 33
+
+    def __init__(self):
+        # view id -> AutoPlayback
+        self.playbacks = collections.OrderedDict()
+        self.scheduled = False
+        # the autoplay_marker setting, and it compiled
+        self.marker_source = None
+        self.marker = None
+
+    def compile_marker(self):
+        """ the autoplay_marker setting as a compiled pattern, or None.
+            compiled only when the setting changes; a pattern that does not
+            compile is reported once, and played without.
+        """
+        source = SETTINGS.get('autoplay_marker', None)
+        if source == self.marker_source:
+            return self.marker
+        self.marker_source = source
+        self.marker = None
+        if source:
+            try:
+                self.marker = re.compile(source)
+            except re.error as exc:
+                print("CodePresenter: autoplay_marker %r is not a valid "
+                      "regular expression: %s" % (source, exc))
+                sublime.status_message("CodePresenter: autoplay_marker is "
+                                       "not a valid regular expression; "
+                                       "playing without it")
+        return self.marker
+
+    def play(self, cp_view, rate):
+        self.compile_marker()
+        if cp_view.view_id in self.playbacks:
+            playback = self.playbacks[cp_view.view_id]
+            playback.rate = rate
+            self.resume([cp_view.view_id])
+            return
+        cp_view.set_initial_cursor()
+        self.playbacks[cp_view.view_id] = AutoPlayback(cp_view, rate)
+        self.schedule()
+
+    def playing(self, view_ids):
+        return [self.playbacks[view_id] for view_id in view_ids
+                if view_id in self.playbacks]
+
+    def pause(self, view_ids):
+        for playback in self.playing(view_ids):
+            playback.paused = True
+
+    def resume(self, view_ids):
+        now = time.time()
+        for playback in self.playing(view_ids):
+            if playback.paused:
+                playback.paused = False
+                playback.last = now
+        self.schedule()
+
+    def set_speed(self, view_ids, rate):
+        for playback in self.playing(view_ids):
+            playback.rate = rate
+
+    def stop(self, view_ids):
+        for view_id in view_ids:
+            self.playbacks.pop(view_id, None)
+
+    def schedule(self):
+        if not self.scheduled and any([not playback.paused for playback
+                                       in self.playbacks.values()]):
+            self.scheduled = True
+            sublime.set_timeout(self.frame, self.FRAME_MS)
+
+    @instrumented('autoplay_frame')
+    def frame(self):
+        self.scheduled = False
+        now = time.time()
+        line_pause = SETTINGS.get('autoplay_line_pause', 0) / 1000.0
+        marker_pause = SETTINGS.get('autoplay_marker_pause', 1000) / 1000.0
+        marker = self.compile_marker()
+
+        for view_id, playback in list(self.playbacks.items()):
+            cp_view = playback.cp_view
+            if cp_view.character_source is None or \
+                    cp_view.view.window() is None or\
+                    cp_view.index >= len(cp_view.character_source):
+                # closed, recycled or finished
+                del self.playbacks[view_id]
+                continue
+            if playback.paused:
+                continue
+            stop = playback.due(now, line_pause, marker, marker_pause)
+            if stop is not None:
+                cp_view.view.run_command('code_presenter_insert',
+                                         {'typed': 0, 'stop': stop})
+        self.schedule()
+
+
+AUTOPLAY = AutoPlayer()
 
 
 class CodePresenterProject(object):
@@ -86,7 +1597,9 @@ class CodePresenterProject(object):
     def __init__(self, window):
         self.window = window
         self.project_file = None
-        self.project_data = None
+        self.has_project = False
+        self.config_loaded = False
+        self.config_dirty = False
 
         self.code_presenter_config = None
         self.source = None
@@ -94,12 +1607,30 @@ class CodePresenterProject(object):
 
         self.dir_fixtures = []
         self.file_fixtures = []
+        self.fixture_matcher = FixtureMatcher([], [])
+
+        self.views = collections.OrderedDict()
+        # sink file -> source file, for files waiting for a view
+        self.pending = collections.OrderedDict()
+        # sink file -> index, for pending files whose view was recycled
+        self.resume_points = {}
+        # ids of views revealed into since they were last written
+        self.dirty = set()
+        self.write_scheduled = False
+        self.watching = False
 
-        self.views = {}
+        self.tree_index = None
+        self.bundle = None
 
         # for substage presentations -- run folder by folder
         self.last_stage = None
         self.did_fixtures = False
+        # stage order, fixed when the first stage runs
+        self.stages = None
+        self.prefetch = None
+        # bumped whenever an activation starts or the presentation is
+        # closed, so stale background work can tell it has been superseded
+        self.activation = 0
 
         CodePresenterProject.PROJECTS[self.project_id] = self
         self.load_config()
@@ -109,20 +1640,68 @@ class CodePresenterProject(object):
         """ used to retrieve a particular project by window ID """
 
         if not window.id() in cls.PROJECTS:
+            cls.prune()
             cls(window)
 
         return cls.PROJECTS[window.id()]
 
     @classmethod
     def find_view(cls, view):
-        """ used to retrieve a particular project by window ID """
-        project = cls.get_project(view.window())
+        """ the presenter view for an editor view, if there is one. never
+            creates a project: a window without one has no presenter views.
+        """
+        project = cls.PROJECTS.get(view.window().id(), None)
         cp_view = None
         if project is not None:
             cp_view = project.get_view(view)
 
         return cp_view
 
+    @classmethod
+    def forget_view(cls, view):
+        """ drop a view from whichever project holds it. closed views no
+            longer know their window, so every project is checked.
+        """
+        for project in cls.PROJECTS.values():
+            project.remove_view(view)
+
+    @classmethod
+    def prune(cls):
+        """ close the projects of windows that are gone """
+        live = set(window.id() for window in sublime.windows())
+        for window_id in [window_id for window_id in cls.PROJECTS
+                          if window_id not in live]:
+            cls.PROJECTS[window_id].close()
+
+    @classmethod
+    def memory_report(cls):
+        """ what the live projects are holding on to """
+        projects = []
+        for project in cls.PROJECTS.values():
+            buffers = [cp_view.character_source
+                       for cp_view in project.views.values()
+                       if cp_view.character_source is not None]
+            prefetched = []
+            if project.prefetch is not None:
+                prefetched = [entry[2] for entry in
+                              list(project.prefetch.prepared.values())]
+            retained = buffers + prefetched
+            projects.append({
+                'window': project.project_id,
+                'views': len(project.views),
+                'pending': len(project.pending),
+                'prefetched': len(prefetched),
+                'indexed_files': len(project.tree_index.files)
+                if project.tree_index is not None else 0,
+                'source_bytes': sum([buf.nbytes for buf in retained
+                                     if not buf.mapped]),
+                'mapped_bytes': sum([buf.nbytes for buf in retained
+                                     if buf.mapped]),
+                'bundle': project.bundle.path
+                if project.bundle is not None else None,
+            })
+        return projects
+
     @property
     def project_id(self):
         """ id of the project object is the window id """
@@ -136,6 +1715,7 @@ class CodePresenterProject(object):
         for afile in files:
             if afile not in self.file_fixtures:
                 self.file_fixtures.append(afile)
+        self.update_fixture_matcher()
         self.update_project_config()
 
     def clear_fixtures(self, dirs, files):
@@ -146,6 +1726,7 @@ class CodePresenterProject(object):
         for afile in files:
             if afile in self.file_fixtures:
                 self.file_fixtures.remove(afile)
+        self.update_fixture_matcher()
         self.update_project_config()
 
     def set_ffwd_point(self, filename, offset):
@@ -174,21 +1755,135 @@ class CodePresenterProject(object):
 
         self.update_project_config()
 
+    def set_checkpoint(self, filename, name, text, offset):
+        """ set the named checkpoint of a file to offset in text, its
+            contents, and move any open presenter view of it there
+        """
+        self.load_config()
+        if not filename.startswith(self.source):
+            print("CodePresenter: file %s not in source %s" % (filename,
+                                                               self.source))
+            return
+
+        checkpoints = self.code_presenter_config.setdefault('checkpoints', {})
+        checkpoints.setdefault(filename, {})[name] =\
+            checkpoint_anchor(text, offset)
+        for cp_view in self.views.values():
+            if cp_view.source == filename:
+                cp_view.checkpoints[name] = offset
+        self.update_project_config()
+
+    def clear_checkpoint(self, filename, name=None):
+        """ clear the named checkpoint of a file, or all of them """
+        self.load_config()
+        checkpoints = (self.code_presenter_config or {}).get('checkpoints',
+                                                             {})
+        if filename not in checkpoints:
+            return
+        if name is None:
+            del checkpoints[filename]
+        else:
+            checkpoints[filename].pop(name, None)
+            if not checkpoints[filename]:
+                del checkpoints[filename]
+        for cp_view in self.views.values():
+            if cp_view.source == filename:
+                if name is None:
+                    cp_view.checkpoints = {}
+                else:
+                    cp_view.checkpoints.pop(name, None)
+        self.update_project_config()
+
+    def file_checkpoints(self, filename, source):
+        """ {name: offset} of the checkpoints of a file, resolved against
+            source, its contents (a str or SourceBuffer)
+        """
+        anchors = {}
+        if self.code_presenter_config is not None:
+            anchors = self.code_presenter_config.get('checkpoints',
+                                                     {}).get(filename, {})
+        if not anchors:
+            return {}
+        with INSTRUMENTS.timed('checkpoints'):
+            return resolve_checkpoints(source[:], anchors)
+
+    def goto_checkpoint(self, name, cp_views):
+        """ move presenter views to their checkpoint called name, each in a
+            single edit; views without one stay where they are
+        """
+        moved = 0
+        for cp_view in cp_views:
+            offset = cp_view.checkpoints.get(name, None)
+            if offset is not None and cp_view.view is not None:
+                cp_view.view.run_command('code_presenter_seek',
+                                         {'to': 'offset', 'offset': offset})
+                moved += 1
+        sublime.status_message("CodePresenter: moved %d of %d files to "
+                               "checkpoint %s" % (moved, len(cp_views), name))
+
+    def set_reveal_mode(self, filename, mode):
+        """ set the reveal mode for a single file. a mode of None clears it,
+            falling back to the project or package default.
+        """
+        self.load_config()
+        if not filename.startswith(self.source):
+            print("CodePresenter: file %s not in source %s" % (filename,
+                                                               self.source))
+            return
+
+        if mode is not None and mode not in REVEAL_MODES:
+            print("CodePresenter: unknown reveal mode %s" % mode)
+            return
+
+        modes = self.code_presenter_config.setdefault('reveal_modes', {})
+        if mode is None:
+            modes.pop(filename, None)
+        else:
+            modes[filename] = mode
+        self.update_project_config()
+
+    def file_reveal_mode(self, filename):
+        """ reveal mode for a file: per-file setting, then project setting,
+            then the package setting.
+        """
+        mode = SETTINGS.get('reveal_mode', 'character')
+        if self.code_presenter_config is not None:
+            mode = self.code_presenter_config.get('reveal_mode', mode)
+            mode = self.code_presenter_config.get('reveal_modes',
+                                                  {}).get(filename, mode)
+        if mode not in REVEAL_MODES:
+            print(("CodePresenter: unknown reveal mode %s for %s, revealing"
+                   " by character") % (mode, filename))
+            mode = 'character'
+        return mode
+
     def file_ffwd_offset(self, filename):
         offset = 0
         if 'offsets' in self.code_presenter_config:
             offset = self.code_presenter_config['offsets'].get(filename, 0)
         return offset
 
-    def load_config(self):
-        """ load the codepresenter config for the project """
-        self.project_file = self.window.project_file_name()
-        self.project_data = self.window.project_data()
+    def load_config(self, reload=False):
+        """ load the codepresenter config for the project.
+
+            the codepresenter section is kept in memory until the project
+            is loaded or saved again, or reload is given; pending changes
+            are written back first. the rest of the project data is not
+            kept, so changes made to it meanwhile are not written over.
+        """
+        project_file = self.window.project_file_name()
+        if self.config_loaded and not reload and\
+                project_file == self.project_file:
+            return
+        self.flush_config()
+        self.config_loaded = True
+        self.project_file = project_file
+        project_data = self.window.project_data()
+        self.has_project = project_data is not None
 
         if self.project_file is not None:
             self.code_presenter_config =\
-                self.project_data.get('settings', {}).get('codepresenter',
-                                                          None)
+                project_data.get('settings', {}).get('codepresenter', None)
         if self.code_presenter_config is not None:
             self.source = self.code_presenter_config.get('source', None)
             self.sink = self.code_presenter_config.get('sink', None)
@@ -197,19 +1892,23 @@ class CodePresenterProject(object):
                     self.code_presenter_config['fixtures'].get('dirs', [])
                 self.file_fixtures =\
                     self.code_presenter_config['fixtures'].get('files', [])
+        self.update_fixture_matcher()
+
+    def update_fixture_matcher(self):
+        """ rebuild the fixture matcher if the fixtures have changed """
+        if self.fixture_matcher.key != (tuple(self.dir_fixtures),
+                                        tuple(self.file_fixtures)):
+            self.fixture_matcher = FixtureMatcher(self.dir_fixtures,
+                                                  self.file_fixtures)
 
     def update_project_config(self):
         """ write changes to the project config """
-        if self.project_data is None:
+        if not self.has_project:
             print("CodePresenter: Requires a project to work!")
             return
 
         if self.code_presenter_config is None:
             self.code_presenter_config = {'active': True}
-            if self.project_data.get('settings', None) is None:
-                self.project_data['settings'] = {}
-            self.project_data['settings']['codepresenter'] =\
-                self.code_presenter_config
 
         self.code_presenter_config['source'] = self.source
         self.code_presenter_config['sink'] = self.sink
@@ -218,96 +1917,426 @@ class CodePresenterProject(object):
             'files': self.file_fixtures,
         }
 
-        self.window.set_project_data(self.project_data)
+        # changes made in quick succession are written back together
+        if not self.config_dirty:
+            self.config_dirty = True
+            sublime.set_timeout(self.flush_config,
+                                SETTINGS.get('config_write_delay', 500))
 
+    def flush_config(self):
+        """ write pending config changes into the project data as it is
+            now
+        """
+        if self.config_dirty:
+            self.config_dirty = False
+            project_data = self.window.project_data()
+            if project_data is None:
+                return
+            if project_data.get('settings', None) is None:
+                project_data['settings'] = {}
+            project_data['settings']['codepresenter'] =\
+                self.code_presenter_config
+            self.window.set_project_data(project_data)
+
+    def invalidate_config(self):
+        """ the project changed; read the config again on next use """
+        self.flush_config()
+        self.config_loaded = False
+
+    def mark_dirty(self, cp_view):
+        """ note that a presenter view has changed, and write it to its sink
+            file shortly; changes made in quick succession are written
+            together
+        """
+        self.dirty.add(cp_view.view_id)
+        if not self.write_scheduled:
+            self.write_scheduled = True
+            sublime.set_timeout(self.write_behind,
+                                SETTINGS.get('write_behind_delay', 1000))
+
+    @instrumented('write_behind')
+    def write_behind(self):
+        """ write the changed presenter views to their sink files, then hand
+            just those files to the sync command, if there is one. the files
+            are written directly rather than saved from the view, so on-save
+            hooks (trimming whitespace, adding a final newline, formatters)
+            can't change the view under the reveal.
+        """
+        self.write_scheduled = False
+        written = []
+        for view_id in self.dirty:
+            cp_view = self.views.get(view_id, None)
+            if cp_view is None or cp_view.view.is_loading():
+                continue
+            view = cp_view.view
+            try:
+                with open(cp_view.sink, "w", encoding='utf-8') as sfile:
+                    sfile.write(view.substr(sublime.Region(0, view.size())))
+            except (IOError, OSError) as exc:
+                print("CodePresenter: could not write %s: %s" %
+                      (cp_view.sink, exc))
+                continue
+            written.append(cp_view.sink)
+        self.dirty = set()
+        INSTRUMENTS.count('files_written_behind', len(written))
+
+        command = SETTINGS.get('write_behind_sync_command', None)
+        if written and command:
+            self.window.run_command(command, {'paths': sorted(written)})
+
+    @instrumented('reload')
+    def reload_source(self, sourcefile):
+        """ patch the changes saved to a source file into its open presenter
+            views, and move its fast forward point along with the text
+        """
+        cp_views = [cp_view for cp_view in self.views.values()
+                    if cp_view.source == sourcefile]
+        if not cp_views:
+            return
+        try:
+            fresh = SourceBuffer.from_file(sourcefile)
+            source_mtime = os.stat(sourcefile).st_mtime
+        except (OSError, UnicodeDecodeError) as exc:
+            print("CodePresenter: not reloading %s: %s" % (sourcefile, exc))
+            return
+        new = fresh[:]
+        fresh.release()
+
+        spans = None
+        for cp_view in cp_views:
+            cp_view.source_mtime = source_mtime
+            cp_view.checkpoints = self.file_checkpoints(sourcefile, new)
+            if cp_view.hunks is not None:
+                sublime.status_message("CodePresenter: %s changed; reset to "
+                                       "pick up the change" %
+                                       os.path.basename(sourcefile))
+                continue
+            spans = changed_spans(cp_view.character_source[:], new)
+            if spans:
+                cp_view.view.run_command('code_presenter_patch',
+                                         {'spans': spans})
+
+        offset = self.file_ffwd_offset(sourcefile)
+        if spans and spans[0][0] < offset:
+            for start, end, text in reversed(spans):
+                offset = shift_offset(offset, start, end, len(text))
+            self.set_ffwd_point(sourcefile, offset)
+
+    def watch_sources(self):
+        """ check the sources of the open presenter views for changes every
+            source_poll_interval milliseconds, if set
+        """
+        interval = SETTINGS.get('source_poll_interval', 0)
+        if interval > 0 and not self.watching:
+            self.watching = True
+            sublime.set_timeout(self.poll_sources, interval)
+
+    def poll_sources(self):
+        self.watching = False
+        if CodePresenterProject.PROJECTS.get(self.project_id) is not self or\
+                not self.views:
+            return
+        changed = set()
+        for cp_view in self.views.values():
+            try:
+                if os.stat(cp_view.source).st_mtime != cp_view.source_mtime:
+                    changed.add(cp_view.source)
+            except OSError:
+                pass
+        for sourcefile in sorted(changed):
+            self.reload_source(sourcefile)
+        self.watch_sources()
+
+    def close(self):
+        """ the window is going away: write back the config, let go of
+            everything held for the presentation and drop the project
+        """
+        self.flush_config()
+        self.activation += 1
+        self.cancel_prefetch()
+        for cp_view in self.views.values():
+            cp_view.release()
+        self.views = collections.OrderedDict()
+        self.pending = collections.OrderedDict()
+        self.resume_points = {}
+        self.dirty = set()
+        self.tree_index = None
+        if self.bundle is not None:
+            self.bundle.close()
+            self.bundle = None
+        CodePresenterProject.PROJECTS.pop(self.project_id, None)
+
+    @instrumented('clear_sink')
     def clear_sink(self, hard=False):
         """
             clear out the sink, closing all views in the process.
             @todo: deal with directories
         """
+        self.close_presentation()
+        self.clear_sink_files(hard)
+
+    def close_presentation(self):
+        """ close all the views and forget the presentation's progress,
+            cancelling any activation still in flight
+        """
         self.last_stage = None
         self.did_fixtures = False
+        self.stages = None
+        self.activation += 1
+        self.cancel_prefetch()
 
         self.load_config()
-        cp_settings = sublime.load_settings('CodePresenter.sublime-settings')
         # close all the views
-        for view in self.window.views():
-            self.window.focus_view(view)
-            self.window.run_command("close_file")
+        self.window.run_command("close_all")
+
+        for cp_view in self.views.values():
+            cp_view.release()
+        self.views = collections.OrderedDict()
+        self.pending = collections.OrderedDict()
+        self.resume_points = {}
+        self.dirty = set()
+
+    def clear_sink_files(self, hard=False):
+        """ remove the presented files from the sink; safe to run off the
+            UI thread
+        """
+        manifest = FixtureManifest(self.source, self.sink)
+        if hard:
+            manifest.delete()
+        else:
+            manifest.load()
 
-        if cp_settings.get('delete_directories', False) or hard:
+        if SETTINGS.get('delete_directories', False) or hard:
             # this seems to be unreliable, at best, on windows
             shutil.rmtree(self.sink)
             os.mkdir(self.sink)
         else:
+            # fixtures are left in place; load_fixtures brings them up to date
+            fixtures = manifest.sink_files()
             toremove, _ = self.find_files(self.sink)
             for file in toremove:
+                if file in fixtures:
+                    continue
                 try:
                     os.remove(file)
                 except TypeError:
                     print(file)
 
-        self.views = {}
-
+    @instrumented('find_files')
     def find_files(self, path):
-        cp_settings = sublime.load_settings('CodePresenter.sublime-settings')
-        # neither of the following can handle file patterns, unfortunately
-        ignore_dirs = cp_settings.get('ignore_directories', [])
-        ignore_files = cp_settings.get('ignore_files', [])
-        ignore_patterns = cp_settings.get('ignore_patterns', [])
-
-        ignore_re = [re.compile(pattern) for pattern in ignore_patterns]
+        matcher = IgnoreMatcher.from_settings(SETTINGS)
 
         filelist = []
         dirlist = []
         for root, dirs, files in os.walk(path):
-            dirs[:] = [adir for adir in dirs if not (adir.startswith('.') or
-                                                     adir in ignore_dirs)]
+            dirs[:] = [adir for adir in dirs if not matcher.skip_dir(adir)]
             dirlist.extend(dirs)
             files = [os.path.join(root, afile) for afile in files
-                     if not (afile.startswith('.') or
-                             afile in ignore_files or
-                             any([pat.match(afile) for pat in ignore_re]))]
+                     if not matcher.skip_file(afile)]
             filelist.extend(files)
         return filelist, dirlist
 
-    def activate(self):
-        self.activate_from(self.source)
+    def source_index(self):
+        """ the index of the source tree, walking it again only if it has
+            changed since the last walk. with a compiled bundle in use, the
+            index comes from the bundle instead.
+        """
+        bundle = self.open_bundle()
+        matcher = IgnoreMatcher.from_settings(SETTINGS)
+        if self.tree_index is None or self.tree_index.root != self.source or\
+                self.tree_index.bundle is not bundle or\
+                not self.tree_index.is_valid(matcher):
+            if bundle is not None:
+                self.tree_index = SourceTreeIndex.from_bundle(self.source,
+                                                              bundle)
+            else:
+                self.tree_index = SourceTreeIndex(self.source,
+                                                  matcher).build()
+        self.tree_index.classify(self.fixture_matcher)
+        return self.tree_index
+
+    def open_bundle(self):
+        """ the compiled bundle configured for the project, if any """
+        path = None
+        if self.code_presenter_config is not None:
+            path = self.code_presenter_config.get('bundle', None)
+        if self.bundle is not None:
+            try:
+                unchanged = os.stat(path).st_mtime == self.bundle.mtime
+            except (OSError, TypeError):
+                unchanged = False
+            if path == self.bundle.path and unchanged and\
+                    self.bundle.header['source'] == self.source:
+                return self.bundle
+            self.bundle.close()
+            self.bundle = None
+        if path is None:
+            return None
+        try:
+            self.bundle = PresentationBundle.open(path)
+        except (IOError, OSError, ValueError) as exc:
+            print("CodePresenter: not using bundle %s: %s" % (path, exc))
+            return None
+        if self.bundle.header['source'] != self.source:
+            print(("CodePresenter: not using bundle %s: it was compiled from "
+                   "%s, not %s") % (path, self.bundle.header['source'],
+                                    self.source))
+            self.bundle.close()
+            self.bundle = None
+        return self.bundle
+
+    def compile_bundle(self, path=None):
+        """ compile the presentation into a bundle and start using it """
+        self.load_config()
+        if self.source is None:
+            print("CodePresenter: Refusing to compile without a source")
+            return
+        if path is None:
+            path = self.source.rstrip(os.sep) + '.cpbundle'
+
+        index = SourceTreeIndex(self.source,
+                                IgnoreMatcher.from_settings(SETTINGS))
+        index.build().classify(self.fixture_matcher)
+        modes = dict((sourcefile, self.file_reveal_mode(sourcefile))
+                     for sourcefile in index.files)
+        try:
+            count = PresentationBundle.compile(
+                path, self.source, index, modes,
+                SETTINGS.get('bundle_compression', False))
+        except UnicodeDecodeError as exc:
+            print(("CodePresenter: Not compiling the bundle, a source file is "
+                   "not encoded as utf-8: %s") % exc)
+            sublime.status_message("CodePresenter: bundle not compiled, see "
+                                   "the console")
+            return
+        sublime.status_message("CodePresenter: compiled %d files into %s" %
+                               (count, path))
+        self.code_presenter_config['bundle'] = path
+        self.update_project_config()
+
+    def discard_bundle(self):
+        """ go back to presenting straight from the source tree """
+        self.load_config()
+        if self.code_presenter_config is not None:
+            self.code_presenter_config.pop('bundle', None)
+            self.update_project_config()
+        self.open_bundle()
 
-    def next_stage(self):
-        substages = [os.path.join(self.source, adir)
-                     for adir in os.listdir(self.source)]
-        substages = [adir for adir in substages
-                     if os.path.isdir(adir)]
-        substages = [stage for stage in substages
-                     if stage not in self.dir_fixtures]
-        substages.sort()
+    def read_source(self, sourcefile, mode):
+        """ (buffer, boundaries) for a source file, from the bundle if it
+            has the file
+        """
+        relpath = os.path.relpath(sourcefile, self.source)
+        if self.bundle is not None and relpath in self.bundle.entries:
+            source_buffer = self.bundle.source_buffer(relpath)
+            return source_buffer, self.bundle.boundaries(relpath, mode,
+                                                         source_buffer)
+        source_buffer = SourceBuffer.from_file(sourcefile)
+        return source_buffer, reveal_boundaries(source_buffer.data, mode)
+
+    def activate(self, asynchronous=False):
+        """ restart the presentation from the top of the source """
+        self.close_presentation()
+        self.activate_from(self.source, asynchronous, clear=True)
+
+    def stage_plan(self):
+        """ the stages of the presentation, in order """
+        if self.stages is None:
+            self.stages = [stage for stage in self.source_index().stages
+                           if stage not in self.dir_fixtures]
+        return self.stages
+
+    def next_stage(self, asynchronous=False):
+        substages = self.stage_plan()
+        if not substages:
+            return
 
-        if self.last_stage is None:
-            self.activate_from(substages[0])
+        if self.last_stage not in substages:
+            self.activate_from(substages[0], asynchronous)
         else:
             nextindex = substages.index(self.last_stage) + 1
             if nextindex < len(substages):
-                self.activate_from(substages[nextindex])
+                self.activate_from(substages[nextindex], asynchronous)
 
+    @instrumented('fixtures')
     def load_fixtures(self):
-        source_files, source_dirs = self.find_files(self.source)
-        for sourcefile in source_files:
-            if sourcefile in self.file_fixtures or\
-                any([sourcefile.startswith(adir)
-                     for adir in self.dir_fixtures]):
-
-                sinkfile = sourcefile.replace(self.source, self.sink, 1)
-
-                # make sure the containing directory exists
-                newdir = os.path.dirname(sinkfile)
-                os.makedirs(newdir, exist_ok=True)
-                shutil.copyfile(sourcefile, sinkfile)
+        """ bring the fixtures in the sink up to date with the source.
+
+            only fixtures that are new or changed since the last run are
+            set up, on a thread pool, using the fixture_mode setting; in
+            symlink mode a fixture directory becomes a single link. fixtures
+            that no longer exist are removed from the sink.
+        """
+        mode = SETTINGS.get('fixture_mode', 'copy')
+        if mode not in FIXTURE_MODES:
+            print("CodePresenter: unknown fixture mode %s, copying" % mode)
+            mode = 'copy'
+        manifest = FixtureManifest(self.source, self.sink)
+        manifest.load()
+
+        # directories linked as a whole, outermost only
+        linked_dirs = []
+        if mode == 'symlink':
+            for adir in sorted(self.dir_fixtures):
+                if os.path.isdir(adir) and adir.startswith(self.source) and\
+                    not any([adir.startswith(linked + os.sep)
+                             for linked in linked_dirs]):
+                    linked_dirs.append(adir)
+
+        fixtures = [adir for adir in linked_dirs]
+        for sourcefile in sorted(self.source_index().fixtures):
+            if not any([sourcefile.startswith(linked + os.sep)
+                        for linked in linked_dirs]):
+                fixtures.append(sourcefile)
+
+        tolink = []
+        current = set()
+        for sourcefile in fixtures:
+            sinkfile = sourcefile.replace(self.source, self.sink, 1)
+            relpath = os.path.relpath(sourcefile, self.source)
+            current.add(relpath)
+            if not manifest.is_current(relpath, sourcefile, sinkfile, mode):
+                tolink.append((relpath, sourcefile, sinkfile))
+
+        # pruning first also takes away stale directory links, so nothing
+        # below gets written through them into the source
+        for relpath in set(manifest.files) - current:
+            sinkfile = os.path.join(self.sink, relpath)
+            if os.path.lexists(sinkfile):
+                os.remove(sinkfile)
+            del manifest.files[relpath]
+
+        workers = max(1, min(SETTINGS.get('fixture_workers', 4),
+                             len(tolink)))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = dict((executor.submit(set_up_fixture, sourcefile,
+                                            sinkfile, mode), relpath)
+                           for relpath, sourcefile, sinkfile in tolink)
+            for future in concurrent.futures.as_completed(futures):
+                relpath = futures[future]
+                try:
+                    entry = future.result()
+                except (IOError, OSError) as exc:
+                    print("CodePresenter: could not set up fixture %s: %s" %
+                          (relpath, exc))
+                    manifest.files.pop(relpath, None)
+                    continue
+                INSTRUMENTS.count('fixtures_set_up')
+                manifest.record(relpath, entry)
+
+        manifest.save()
         self.did_fixtures = True
 
-    def activate_from(self, location):
+    @instrumented('activate')
+    def activate_from(self, location, asynchronous=False, clear=False):
         """
             start the code presentation
+
+            scanning, reading and preparing the sink happen first, on the
+            async thread when asynchronous is set; views are then opened in
+            batches on the UI thread, first file first, so the presenter can
+            start typing while the rest are still loading. with clear, the
+            sink is emptied as part of the preparation.
         """
         if self.source is None or self.sink is None:
             print(("CodePresenter: Refusing to activate without"
@@ -318,59 +2347,290 @@ class CodePresenterProject(object):
                    " from %s (not in %s)") % (location, self.source))
 
         self.last_stage = location
+        self.activation += 1
+        token = self.activation
+
+        if asynchronous:
+            sublime.status_message("CodePresenter: preparing %s" % location)
+            sublime.set_timeout_async(
+                lambda: self.prepare_activation(location, token, clear,
+                                                sublime.set_timeout), 0)
+        else:
+            self.prepare_activation(location, token, clear,
+                                    lambda callback, delay: callback())
+
+    @instrumented('prepare')
+    def prepare_activation(self, location, token, clear, deliver):
+        """
+            the background half of an activation: bring the sink up to date,
+            read the files of the stage and hand them to the UI thread in
+            batches through deliver. gives up as soon as another activation
+            starts.
+        """
+        if clear:
+            self.clear_sink_files()
         if not self.did_fixtures:
             self.load_fixtures()
 
-        cp_settings = sublime.load_settings('CodePresenter.sublime-settings')
-        touch_files = cp_settings.get('touch_sink_files', False)
-        # handle fixtures
+        touch_files = SETTINGS.get('touch_sink_files', False)
+
+        # with stage_diff, files that were in the previous stage only have
+        # their changes revealed
+        previous_stage = None
+        previous_files = frozenset()
+        stages = self.stage_plan()
+        if SETTINGS.get('stage_diff', False) and location in stages and\
+                stages.index(location) > 0:
+            previous_stage = stages[stages.index(location) - 1]
+            previous_files = frozenset(
+                self.source_index().presented_under(previous_stage))
+
+        source_files = self.source_index().presented_under(location)
+        if self.prefetch is not None:
+            if self.prefetch.stage == location:
+                self.prefetch.wait()
+            else:
+                self.cancel_prefetch()
+
+        # with a bounded pool, only the first files get a view right away;
+        # the rest wait until they are requested
+        pending = []
+        max_views = SETTINGS.get('max_open_views', 0)
+        if max_views > 0:
+            pending = source_files[max_views:]
+            source_files = source_files[:max_views]
+
+        # the first file goes on its own so it can be typed into straight
+        # away; the rest follow in batches that keep the UI responsive
+        batch_size = max(1, SETTINGS.get('activation_batch_size', 8))
+        batch = []
+        delivered = 0
+        total = len(source_files)
+        for position, sourcefile in enumerate(source_files):
+            if token != self.activation:
+                self.release_views(batch)
+                return
+            previous = None
+            if previous_stage is not None:
+                previous = os.path.join(previous_stage,
+                                        os.path.relpath(sourcefile, location))
+                if previous not in previous_files:
+                    previous = None
+            cp_view = self.prepare_source(sourcefile, touch_files, previous)
+            if cp_view is not None:
+                batch.append(cp_view)
+            if batch and (not delivered or len(batch) >= batch_size):
+                deliver(functools.partial(self.open_batch, token, batch,
+                                          position + 1, total,
+                                          delivered > 0), 0)
+                delivered += len(batch)
+                batch = []
+        if batch:
+            deliver(functools.partial(self.open_batch, token, batch, total,
+                                      total, delivered > 0), 0)
+        deliver(functools.partial(self.finish_activation, token, location,
+                                  pending), 0)
+
+    def open_batch(self, token, cp_views, done, total, keep_focus):
+        """ give a batch of prepared presenter views editor views. with
+            keep_focus, the focus is left where the presenter has it rather
+            than on the last view opened.
+        """
+        if token != self.activation:
+            self.release_views(cp_views)
+            return
+        focused = self.window.active_view() if keep_focus else None
+        for cp_view in cp_views:
+            self.show_view(cp_view)
+        if focused is not None:
+            self.window.focus_view(focused)
+        if done < total:
+            sublime.status_message("CodePresenter: opened %d of %d files" %
+                                   (done, total))
+
+    def finish_activation(self, token, location, pending):
+        if token != self.activation:
+            return
+        for sourcefile in pending:
+            sinkfile = sourcefile.replace(self.source, self.sink, 1)
+            self.pending[sinkfile] = sourcefile
 
-        source_files, source_dirs = self.find_files(location)
+        if self.pending:
+            sublime.status_message(("CodePresenter: %d files pending, use "
+                                    "Open Pending File to open them") %
+                                   len(self.pending))
+        else:
+            sublime.status_message("CodePresenter: %s is ready" % location)
 
-        # order the source file tabs in a nice way
-        source_files.sort(reverse=True)
+        self.cancel_prefetch()
+        if SETTINGS.get('prefetch_next_stage', True):
+            self.start_prefetch(location)
+        self.watch_sources()
 
-        for sourcefile in source_files:
+        # this helps presentations using the sftp plugin operate smoothly
+        if SETTINGS.get('sftp_upload_folder', False):
+            self.window.run_command('sftp_upload_folder')
 
-            if sourcefile in self.file_fixtures or\
-                any([sourcefile.startswith(adir)
-                     for adir in self.dir_fixtures]):
-                continue
+    @staticmethod
+    def release_views(cp_views):
+        for cp_view in cp_views:
+            cp_view.release()
 
-            sinkfile = sourcefile.replace(self.source, self.sink, 1)
-            try:
-                # make sure the containing directory exists
-                newdir = os.path.dirname(sinkfile)
-                os.makedirs(newdir, exist_ok=True)
+    def start_prefetch(self, location):
+        """ start preparing the stage after location in the background """
+        stages = self.stage_plan()
+        if self.bundle is not None or location not in stages or\
+                location == stages[-1]:
+            return
+        upcoming = stages[stages.index(location) + 1]
+
+        source_files = self.source_index().presented_under(upcoming)
+        max_views = SETTINGS.get('max_open_views', 0)
+        if max_views > 0:
+            source_files = source_files[:max_views]
+        jobs = [(sourcefile, sourcefile.replace(self.source, self.sink, 1),
+                 self.file_reveal_mode(sourcefile))
+                for sourcefile in source_files]
+        self.prefetch = StagePrefetch(upcoming, jobs).start()
+
+    def cancel_prefetch(self):
+        if self.prefetch is not None:
+            self.prefetch.cancel()
+            self.prefetch = None
+
+    def open_source(self, sourcefile, touch_files=False):
+        """ set up the sink file and a presenter view for a source file """
+        sinkfile = sourcefile.replace(self.source, self.sink, 1)
+        self.pending.pop(sinkfile, None)
+        cp_view = self.prepare_source(sourcefile, touch_files,
+                                      offset=self.resume_points.pop(sinkfile,
+                                                                    None))
+        if cp_view is not None:
+            self.show_view(cp_view)
+
+    def prepare_source(self, sourcefile, touch_files=False, previous=None,
+                       offset=None):
+        """ read a source file and set up its sink file, returning a
+            presenter view that is ready to be shown, or None if the file
+            could not be read. does not touch the editor, so it may run off
+            the UI thread. given the same file in the previous stage, only
+            what changed since then is revealed. revealing starts from
+            offset if given, or else the fast forward point.
+        """
+        sinkfile = sourcefile.replace(self.source, self.sink, 1)
+        try:
+            # make sure the containing directory exists
+            newdir = os.path.dirname(sinkfile)
+            os.makedirs(newdir, exist_ok=True)
+            if offset is None:
                 offset = self.file_ffwd_offset(sourcefile)
-                if touch_files or offset > 0:
-                    sfile = open(sinkfile, "w", encoding='utf-8')
-                    if offset is not None:
-                        with open(sourcefile, 'r', encoding='utf-8') as ifile:
-                            contents = ifile.read()
-                            sfile.write(contents[:offset])
-                    sfile.close()
-
-                new_view = self.window.open_file(sinkfile)
-                new_view.set_scratch(True)
-
-                cp_view = CodePresenterView(new_view, sourcefile,
-                                            sinkfile, offset)
-                with open(sourcefile, 'r', encoding='utf-8') as insource:
-                    cp_view.character_source = list(insource.read())
-                self.add_view(cp_view)
-
-            except UnicodeDecodeError:
-                print(("CodePresenter: Error decoding source file. This likely"
-                       " means the file is not encoded as utf-8, which is "
-                       "currently a requirement of CodePresenter. The "
-                       "problem file was: %s") % sourcefile)
-                print(("Please report an issue at "
-                       "https://github.com/fwph/codepresenter/issue with the "
-                       "correct encoding of your file if you know it."))
-        # this helps presentations using the sftp plugin operate smoothly
-        if cp_settings.get('sftp_upload_folder', False):
-            self.window.run_command('sftp_upload_folder')
+            mode = self.file_reveal_mode(sourcefile)
+            prepared = None
+            if self.prefetch is not None:
+                prepared = self.prefetch.take(sourcefile, mode)
+            with INSTRUMENTS.timed('read'):
+                if prepared is None:
+                    source_buffer, boundaries = self.read_source(sourcefile,
+                                                                 mode)
+                else:
+                    source_buffer, boundaries = prepared
+                    INSTRUMENTS.count('files_prefetched')
+                if previous is not None:
+                    offset = 0
+                cp_view = CodePresenterView(None, sourcefile, sinkfile,
+                                            offset)
+                cp_view.character_source = source_buffer
+                cp_view.boundaries = boundaries
+                cp_view.reveal_mode = mode
+            try:
+                cp_view.source_mtime = os.stat(sourcefile).st_mtime
+            except OSError:
+                pass
+            cp_view.checkpoints = self.file_checkpoints(sourcefile,
+                                                        source_buffer)
+            if previous is not None:
+                with INSTRUMENTS.timed('diff'):
+                    previous_buffer, _ = self.read_source(previous,
+                                                          'character')
+                    cp_view.diff_from(previous_buffer[:])
+                    previous_buffer.release()
+            if touch_files or cp_view.index > 0 or cp_view.tail > 0:
+                with open(sinkfile, "w", encoding='utf-8') as sfile:
+                    sfile.write(cp_view.contents())
+            INSTRUMENTS.count('files_read')
+            INSTRUMENTS.count('chars_read', len(source_buffer))
+            return cp_view
+
+        except UnicodeDecodeError:
+            print(("CodePresenter: Error decoding source file. This likely"
+                   " means the file is not encoded as utf-8, which is "
+                   "currently a requirement of CodePresenter. The "
+                   "problem file was: %s") % sourcefile)
+            print(("Please report an issue at "
+                   "https://github.com/fwph/codepresenter/issue with the "
+                   "correct encoding of your file if you know it."))
+        return None
+
+    def open_pending(self, sinkfile):
+        """ open a pending file on demand """
+        sourcefile = self.pending.get(sinkfile, None)
+        if sourcefile is not None:
+            self.open_source(sourcefile,
+                             SETTINGS.get('touch_sink_files', False))
+
+    @instrumented('open_view')
+    def show_view(self, cp_view):
+        """ give a presenter view an editor view: one already showing its
+            sink file, the least recently used one from a full pool, or a
+            newly opened one.
+        """
+        view = self.window.find_open_file(cp_view.sink)
+        if view is not None:
+            self.remove_view(view)
+        else:
+            view = self.recycle_view(cp_view.sink)
+        if view is None:
+            INSTRUMENTS.count('views_opened')
+            view = self.window.open_file(cp_view.sink)
+            view.set_scratch(True)
+        else:
+            self.window.focus_view(view)
+
+        cp_view.view = view
+        if not view.is_loading():
+            # no on_load is coming, so sync the contents and cursor now
+            prefix = cp_view.contents()
+            if view.substr(sublime.Region(0, view.size())) != prefix:
+                view.run_command('code_presenter_replace', {'text': prefix})
+            cp_view.last_size = view.size()
+            cp_view.set_initial_cursor()
+        self.add_view(cp_view)
+
+    def recycle_view(self, sinkfile):
+        """ when the view pool is full, retarget the least recently used
+            presenter view to sinkfile. unsaved changes in it are discarded,
+            just as they would be on close. its file goes back to pending,
+            to pick up where it left off when opened again.
+        """
+        max_views = SETTINGS.get('max_open_views', 0)
+        if max_views <= 0 or len(self.views) < max_views:
+            return None
+
+        view_id, cp_view = self.views.popitem(last=False)
+        self.dirty.discard(view_id)
+        INSTRUMENTS.count('views_recycled')
+        self.pending[cp_view.sink] = cp_view.source
+        if cp_view.hunks is None:
+            # mid-diff views start their diff again instead
+            self.resume_points[cp_view.sink] = cp_view.index
+        cp_view.release()
+        cp_view.view.retarget(sinkfile)
+        return cp_view.view
+
+    def touch_view(self, view):
+        """ mark a view as most recently used """
+        if view.id() in self.views:
+            self.views.move_to_end(view.id())
 
     def add_view(self, view):
         """ put it in the view dict. """
@@ -380,13 +2640,24 @@ class CodePresenterProject(object):
         """ retrieve a view from the local store """
         return self.views.get(view.id(), None)
 
+    def remove_view(self, view):
+        """ drop a view from the local store, releasing its source """
+        cp_view = self.views.pop(view.id(), None)
+        self.dirty.discard(view.id())
+        if cp_view is not None:
+            cp_view.release()
+
 
 class CodePresenterBaseCommand(sublime_plugin.WindowCommand):
     """ base class for the various commands that need info about
         the project """
     def __init__(self, *args, **kwargs):
         super(CodePresenterBaseCommand, self).__init__(*args, **kwargs)
-        self.cp_project = CodePresenterProject.get_project(self.window)
+
+    @property
+    def cp_project(self):
+        """ looked up on use, since projects are dropped with their window """
+        return CodePresenterProject.get_project(self.window)
 
     def load_config(self):
         """ load the codepresenter config for the project """
@@ -398,10 +2669,15 @@ class CodePresenterSetSourceCommand(CodePresenterBaseCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterSetSourceCommand, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_set_source')
     def run(self, **kwargs):
         """ run """
         dirs = kwargs['dirs']
         self.cp_project.load_config()
+        if self.cp_project.source != dirs[0] and\
+                self.cp_project.code_presenter_config is not None:
+            # a bundle belongs to the source it was compiled from
+            self.cp_project.code_presenter_config.pop('bundle', None)
         self.cp_project.source = dirs[0]
         if self.cp_project.source == self.cp_project.sink:
             self.cp_project.sink = None
@@ -413,6 +2689,7 @@ class CodePresenterSetSinkCommand(CodePresenterBaseCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterSetSinkCommand, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_set_sink')
     def run(self, **kwargs):
         """ run """
         dirs = kwargs['dirs']
@@ -432,6 +2709,7 @@ class CodePresenterSetFixtureCommand(CodePresenterBaseCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterSetFixtureCommand, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_set_fixture')
     def run(self, **kwargs):
         """ run """
         dirs = kwargs['dirs']
@@ -448,6 +2726,7 @@ class CodePresenterClearFixtureCommand(CodePresenterBaseCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterClearFixtureCommand, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_clear_fixture')
     def run(self, **kwargs):
         """ run """
         dirs = kwargs['dirs']
@@ -456,48 +2735,249 @@ class CodePresenterClearFixtureCommand(CodePresenterBaseCommand):
 
 
 class CodePresenterDebugCommand(CodePresenterBaseCommand):
-    """ print some debug information to the console """
+    """ print some debug information to the console
+
+        with an action, controls the instrumentation instead: 'enable',
+        'disable', 'reset', or 'export' (to path, or a file in the temp
+        directory) the timings as json.
+    """
     def __init__(self, *args, **kwargs):
         super(CodePresenterDebugCommand, self).__init__(*args, **kwargs)
 
-    def run(self):
-        self.load_config()
-        print(self.cp_project)
-        print(os.listdir(self.cp_project.source))
+    def run(self, action=None, path=None):
+        if action == 'enable':
+            INSTRUMENTS.enabled = True
+        elif action == 'disable':
+            INSTRUMENTS.enabled = False
+        elif action == 'reset':
+            INSTRUMENTS.reset()
+        elif action == 'export':
+            if path is None:
+                path = os.path.join(tempfile.gettempdir(),
+                                    'codepresenter-stats.json')
+            INSTRUMENTS.export(path)
+            print("CodePresenter: wrote timings to %s" % path)
+        else:
+            self.load_config()
+            print(self.cp_project)
+            print(os.listdir(self.cp_project.source))
+            self.print_memory()
+            self.print_timings()
+
+    def print_memory(self):
+        projects = CodePresenterProject.memory_report()
+        print("CodePresenter: %d live projects" % len(projects))
+        for project in projects:
+            print(("CodePresenter: window %d: %d views, %d pending, "
+                   "%d prefetched, %d indexed files, %d source bytes "
+                   "retained (%d mapped)%s") %
+                  (project['window'], project['views'], project['pending'],
+                   project['prefetched'], project['indexed_files'],
+                   project['source_bytes'], project['mapped_bytes'],
+                   ", bundle %s" % project['bundle']
+                   if project['bundle'] else ""))
+
+    def print_timings(self):
+        report = INSTRUMENTS.report()
+        if not report['enabled'] and not report['phases']:
+            print("CodePresenter: instrumentation is off")
+            return
+        for name, phase in sorted(report['phases'].items()):
+            print(("CodePresenter: %-30s %6d runs %10.3fms total %8.3fms max"
+                   "  p50 %.3fms p95 %.3fms p99 %.3fms") %
+                  (name, phase['count'], phase['total_ms'], phase['max_ms'],
+                   phase['p50_ms'], phase['p95_ms'], phase['p99_ms']))
+        for name, value in sorted(report['counters'].items()):
+            print("CodePresenter: %-30s %d" % (name, value))
+
+
+class CodePresenterProfileCommand(CodePresenterBaseCommand):
+    """ capture where the time goes between 'start' and 'stop' (by default,
+        whichever applies): a .prof file (cProfile, for pstats or snakeviz)
+        and a chrome trace (for chrome://tracing or perfetto) are written to
+        path, the profile_directory setting or the temp directory.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterProfileCommand, self).__init__(*args, **kwargs)
+
+    def run(self, action='toggle', path=None):
+        if action == 'toggle':
+            action = 'stop' if PROFILER.active else 'start'
+
+        if action == 'start':
+            PROFILER.start()
+            sublime.status_message("CodePresenter: profiling")
+        elif action == 'stop':
+            if path is None:
+                path = SETTINGS.get('profile_directory', None) or\
+                    tempfile.gettempdir()
+            written = PROFILER.stop(path)
+            for filename in written:
+                print("CodePresenter: wrote %s" % filename)
+            if written:
+                sublime.status_message("CodePresenter: profile written to "
+                                       "%s" % path)
+            else:
+                sublime.status_message("CodePresenter: could not write the "
+                                       "profile, see the console")
+
+
+class CodePresenterCompileCommand(CodePresenterBaseCommand):
+    """ compile the presentation into a bundle file (by default next to the
+        source folder) that activation uses instead of the source tree.
+        with discard, stop using the bundle.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterCompileCommand, self).__init__(*args, **kwargs)
+
+    @instrumented('code_presenter_compile')
+    def run(self, path=None, discard=False):
+        if discard:
+            self.cp_project.discard_bundle()
+        else:
+            self.cp_project.compile_bundle(path)
+
+
+class CodePresenterOpenPendingCommand(CodePresenterBaseCommand):
+    """ pick one of the files that has not been given a view yet """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterOpenPendingCommand, self).__init__(*args, **kwargs)
+
+    @instrumented('code_presenter_open_pending')
+    def run(self, *args, **kwargs):
+        pending = list(self.cp_project.pending)
+        if not pending:
+            sublime.status_message("CodePresenter: no pending files")
+            return
+
+        def on_done(index):
+            if index >= 0:
+                self.cp_project.open_pending(pending[index])
+
+        items = [os.path.relpath(sinkfile, self.cp_project.sink)
+                 for sinkfile in pending]
+        self.window.show_quick_panel(items, on_done)
 
 
 class CodePresenterActivateCommand(CodePresenterBaseCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterActivateCommand, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_activate')
     def run(self, *args, **kwargs):
         self.load_config()
 
+        asynchronous = SETTINGS.get('async_activation', True)
         if 'dirs' in kwargs:
-            self.cp_project.activate_from(kwargs['dirs'][0])
+            self.cp_project.activate_from(kwargs['dirs'][0], asynchronous)
         else:
-            self.cp_project.clear_sink()
-            self.cp_project.activate()
+            self.cp_project.activate(asynchronous)
 
 
 class CodePresenterNextStageCommand(CodePresenterBaseCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterNextStageCommand, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_next_stage')
     def run(self, *args, **kwargs):
         self.load_config()
-        self.cp_project.next_stage()
+        self.cp_project.next_stage(SETTINGS.get('async_activation', True))
 
 
 class CodePresenterResetCommand(CodePresenterBaseCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterResetCommand, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_reset')
     def run(self, *args, **kwargs):
         self.load_config()
         self.cp_project.clear_sink(kwargs.get('hard', False))
 
 
+class CodePresenterAutoplayCommand(CodePresenterBaseCommand):
+    """ play the presentation without typing: reveal the active presenter
+        view (or with all_views, every open one) at speed characters per
+        second.
+
+        action is one of 'start', 'pause', 'resume', 'toggle', 'stop' or
+        'speed' (change the speed of whatever is playing).
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterAutoplayCommand, self).__init__(*args, **kwargs)
+
+    @instrumented('code_presenter_autoplay')
+    def run(self, action='start', speed=None, all_views=False):
+        project = self.cp_project
+        view_ids = list(project.views)
+        if speed is None:
+            speed = SETTINGS.get('autoplay_speed', 20)
+
+        if action == 'toggle':
+            playing = AUTOPLAY.playing(view_ids)
+            if not playing:
+                action = 'start'
+            elif any([not playback.paused for playback in playing]):
+                action = 'pause'
+            else:
+                action = 'resume'
+
+        if action == 'start':
+            if all_views:
+                cp_views = list(project.views.values())
+            else:
+                view = self.window.active_view()
+                cp_view = project.get_view(view) if view is not None \
+                    else None
+                cp_views = [cp_view] if cp_view is not None else []
+            if not cp_views:
+                sublime.status_message("CodePresenter: nothing to play; "
+                                       "switch to a presenter tab first")
+            for cp_view in cp_views:
+                AUTOPLAY.play(cp_view, speed)
+        elif action == 'pause':
+            AUTOPLAY.pause(view_ids)
+        elif action == 'resume':
+            AUTOPLAY.resume(view_ids)
+        elif action == 'speed':
+            AUTOPLAY.set_speed(view_ids, speed)
+        elif action == 'stop':
+            AUTOPLAY.stop(view_ids)
+
+
+class CodePresenterGotoCheckpointCommand(CodePresenterBaseCommand):
+    """ move the active presenter view (or with all_views, every open one)
+        to the checkpoint called name, picking one if no name is given
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterGotoCheckpointCommand, self).__init__(*args,
+                                                                 **kwargs)
+
+    @instrumented('code_presenter_goto_checkpoint')
+    def run(self, name=None, all_views=False):
+        project = self.cp_project
+        if all_views:
+            cp_views = list(project.views.values())
+        else:
+            view = self.window.active_view()
+            cp_view = project.get_view(view) if view is not None else None
+            cp_views = [cp_view] if cp_view is not None else []
+        if name is not None:
+            project.goto_checkpoint(name, cp_views)
+            return
+
+        names = sorted(set([checkpoint for cp_view in cp_views
+                            for checkpoint in cp_view.checkpoints]))
+        if not names:
+            sublime.status_message("CodePresenter: no checkpoints")
+            return
+
+        def on_done(index):
+            if index >= 0:
+                project.goto_checkpoint(names[index], cp_views)
+
+        self.window.show_quick_panel(names, on_done)
+
+
 class CodePresenterInsertCommand(sublime_plugin.TextCommand):
     """
     Does the actual text insertion into the view.
@@ -510,10 +2990,101 @@ class CodePresenterInsertCommand(sublime_plugin.TextCommand):
         self.last_region = sublime.Region(-1, 0)
         self.character_source = None
 
-    def run(self, edit):
+    @instrumented('keystroke')
+    def run(self, edit, typed=1, count=None, stop=None):
+        INSTRUMENTS.count('keystrokes')
         cp_view = CodePresenterProject.find_view(self.view)
         if cp_view is not None:
-            cp_view.do_edit(edit)
+            cp_view.do_edit(edit, typed, count, stop)
+            if SETTINGS.get('write_behind', False):
+                CodePresenterProject.get_project(
+                    self.view.window()).mark_dirty(cp_view)
+
+
+class CodePresenterSeekCommand(sublime_plugin.TextCommand):
+    """
+    Move the reveal point of a presenter view without retyping: back count
+    tokens or lines, forward to the end of the count-th next marker
+    (pattern, by default the autoplay_marker setting), or to an offset in
+    the source.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterSeekCommand, self).__init__(*args, **kwargs)
+
+    @instrumented('code_presenter_seek')
+    def run(self, edit, to='token', count=1, offset=0, pattern=None):
+        cp_view = CodePresenterProject.find_view(self.view)
+        if cp_view is None:
+            return
+        if cp_view.hunks is not None:
+            sublime.status_message("CodePresenter: cannot seek until the "
+                                   "changes from the last stage are revealed")
+            return
+
+        if to in SEEK_PATTERNS:
+            target = cp_view.starts_before(SEEK_PATTERNS[to], count)
+        elif to == 'marker':
+            pattern = pattern or SETTINGS.get('autoplay_marker', None)
+            if not pattern:
+                sublime.status_message("CodePresenter: no marker pattern; "
+                                       "set autoplay_marker")
+                return
+            try:
+                marker = re.compile(pattern)
+            except re.error as exc:
+                print("CodePresenter: marker %r is not a valid regular "
+                      "expression: %s" % (pattern, exc))
+                sublime.status_message("CodePresenter: the marker is not a "
+                                       "valid regular expression")
+                return
+            target = None
+            for _ in range(count):
+                stop = cp_view.end_after(marker, target)
+                if stop is None:
+                    break
+                target = stop
+            if target is None:
+                sublime.status_message("CodePresenter: no more markers")
+                return
+        elif to == 'offset':
+            target = offset
+        else:
+            print("CodePresenter: cannot seek to %s" % to)
+            return
+
+        cp_view.seek(edit, target)
+        if SETTINGS.get('write_behind', False):
+            CodePresenterProject.get_project(
+                self.view.window()).mark_dirty(cp_view)
+
+
+class CodePresenterPatchCommand(sublime_plugin.TextCommand):
+    """
+    Patch changes saved to the source file into a presenter view. spans
+    are [start, end, text] replacements in the source, in order.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterPatchCommand, self).__init__(*args, **kwargs)
+
+    @instrumented('code_presenter_patch')
+    def run(self, edit, spans=()):
+        cp_view = CodePresenterProject.find_view(self.view)
+        if cp_view is not None:
+            # from the end back, so the offsets of the others still hold
+            for start, end, text in reversed(spans):
+                cp_view.patch(edit, start, end, text)
+
+
+class CodePresenterReplaceCommand(sublime_plugin.TextCommand):
+    """
+    Replace the whole contents of the view in a single edit.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterReplaceCommand, self).__init__(*args, **kwargs)
+
+    @instrumented('code_presenter_replace')
+    def run(self, edit, text=''):
+        self.view.replace(edit, sublime.Region(0, self.view.size()), text)
 
 
 class CodePresenterSetFforward(sublime_plugin.TextCommand):
@@ -526,6 +3097,7 @@ class CodePresenterSetFforward(sublime_plugin.TextCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterSetFforward, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_set_fforward')
     def run(self, *args, **kwargs):
         """ translating the event coords to a text offset seems
             over-complicated, but it seems to work.
@@ -548,11 +3120,92 @@ class CodePresenterClearFforward(sublime_plugin.TextCommand):
     def __init__(self, *args, **kwargs):
         super(CodePresenterClearFforward, self).__init__(*args, **kwargs)
 
+    @instrumented('code_presenter_clear_fforward')
     def run(self, *args, **kwargs):
         project = CodePresenterProject.get_project(self.view.window())
         project.clear_ffwd_point(self.view.file_name())
 
 
+class CodePresenterSetCheckpointCommand(sublime_plugin.TextCommand):
+    """
+    Set a named checkpoint in this file, to jump the presentation to later.
+
+    In a source file, the checkpoint is where the context menu was opened,
+    or the cursor; in a presenter view, it is the reveal point. Asks for a
+    name if none is given.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterSetCheckpointCommand, self).__init__(*args,
+                                                                **kwargs)
+
+    @instrumented('code_presenter_set_checkpoint')
+    def run(self, edit, name=None, event=None):
+        project = CodePresenterProject.get_project(self.view.window())
+        cp_view = CodePresenterProject.find_view(self.view)
+        if cp_view is not None:
+            filename = cp_view.source
+            text = cp_view.character_source[:]
+            offset = min(cp_view.index, len(text))
+        else:
+            filename = self.view.file_name()
+            text = self.view.substr(sublime.Region(0, self.view.size()))
+            if event is not None:
+                offset = self.view.window_to_text(list(event.values()))
+            else:
+                offset = self.view.sel()[0].b
+        if filename is None:
+            return
+        if name is not None:
+            project.set_checkpoint(filename, name, text, offset)
+            return
+
+        def on_done(name):
+            if name:
+                project.set_checkpoint(filename, name, text, offset)
+
+        project.load_config()
+        existing = (project.code_presenter_config or {}).get(
+            'checkpoints', {}).get(filename, {})
+        self.view.window().show_input_panel(
+            "Checkpoint name:", str(len(existing) + 1), on_done, None, None)
+
+    def want_event(self):
+        return True
+
+
+class CodePresenterClearCheckpointCommand(sublime_plugin.TextCommand):
+    """
+    Clear the named checkpoint of this file, or all of them.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterClearCheckpointCommand, self).__init__(*args,
+                                                                  **kwargs)
+
+    @instrumented('code_presenter_clear_checkpoint')
+    def run(self, edit, name=None):
+        project = CodePresenterProject.get_project(self.view.window())
+        cp_view = CodePresenterProject.find_view(self.view)
+        filename = cp_view.source if cp_view is not None else \
+            self.view.file_name()
+        if filename is not None:
+            project.clear_checkpoint(filename, name)
+
+
+class CodePresenterSetRevealMode(sublime_plugin.TextCommand):
+    """
+    Set how much of this file is revealed per keystroke.
+
+    Passing no mode clears the per-file setting.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CodePresenterSetRevealMode, self).__init__(*args, **kwargs)
+
+    @instrumented('code_presenter_set_reveal_mode')
+    def run(self, *args, **kwargs):
+        project = CodePresenterProject.get_project(self.view.window())
+        project.set_reveal_mode(self.view.file_name(), kwargs.get('mode'))
+
+
 class CodePresenterEventListener(sublime_plugin.EventListener):
     """
     Listens for new views, and view modified events.
@@ -562,26 +3215,119 @@ class CodePresenterEventListener(sublime_plugin.EventListener):
     def __init__(self, *args, **kwargs):
         super(CodePresenterEventListener, self).__init__(*args, **kwargs)
 
+    @instrumented('on_modified')
     def on_modified(self, view):
-        """ runs the insertion command when the target view is modified """
+        """ runs the insertion command when the target view is modified,
+            telling it how many characters were typed since the last run
+        """
         if view.window() is None:
             return
         try:
             cp_view = CodePresenterProject.find_view(view)
             if cp_view is not None:
+                size = view.size()
                 if cp_view.last_size is None:
-                    cp_view.last_size = view.size()
-                elif cp_view.last_size > view.size():
-                    cp_view.last_size = view.size()
-                    return
-                elif cp_view.last_size == view.size():
+                    cp_view.last_size = size - 1
+                elif cp_view.last_size >= size:
+                    cp_view.last_size = size
                     return
-                view.run_command('code_presenter_insert')
+                view.run_command('code_presenter_insert',
+                                 {'typed': size - cp_view.last_size})
         except AttributeError:
             pass
         except Exception as exc:
             print('CodePresenter encountered a problem in on_load: %s' % exc)
 
+    def on_load_project(self, window):
+        """ read the config of a (re)loaded project afresh """
+        project = CodePresenterProject.PROJECTS.get(window.id(), None)
+        if project is not None:
+            project.invalidate_config()
+
+    def on_post_save_project(self, window):
+        """ read the config of a saved project afresh """
+        project = CodePresenterProject.PROJECTS.get(window.id(), None)
+        if project is not None:
+            project.invalidate_config()
+
+    def on_pre_close_window(self, window):
+        """ write back any pending config changes and drop the project """
+        project = CodePresenterProject.PROJECTS.get(window.id(), None)
+        if project is not None:
+            project.close()
+
+    @instrumented('on_text_command')
+    def on_text_command(self, view, command_name, args):
+        """ swap keystroke commands in a presenter view for a reveal, so each
+            keystroke makes a single edit (and enter can't set off macros)
+        """
+        if command_name not in KEYSTROKE_COMMANDS or view.window() is None:
+            return None
+        try:
+            if not SETTINGS.get('intercept_keystrokes', True):
+                return None
+            cp_view = CodePresenterProject.find_view(view)
+            if cp_view is None or cp_view.done:
+                return None
+            selection = view.sel()
+            if len(selection) != 1 or not selection[0].empty() or\
+                    selection[0].b != cp_view.point:
+                return None
+            count = keystroke_count(command_name, args or {})
+            if count > 0:
+                INSTRUMENTS.count('intercepted')
+                return ('code_presenter_insert', {'typed': 0, 'count': count})
+        except AttributeError:
+            pass
+        except Exception as exc:
+            print('CodePresenter encountered a problem in on_text_command: %s'
+                  % exc)
+        return None
+
+    @instrumented('on_close')
+    def on_close(self, view):
+        """ release the source of a presenter view once it is closed """
+        try:
+            CodePresenterProject.forget_view(view)
+        except Exception as exc:
+            print('CodePresenter encountered a problem in on_close: %s' % exc)
+
+    @instrumented('on_activated')
+    def on_activated(self, view):
+        """ keep the view pool ordered by use, and open pending files when
+            their sink file is opened by hand
+        """
+        try:
+            project = CodePresenterProject.PROJECTS.get(
+                view.window().id(), None)
+            if project is None:
+                return
+            if project.get_view(view) is not None:
+                project.touch_view(view)
+            elif view.file_name() in project.pending:
+                project.open_pending(view.file_name())
+        except AttributeError:
+            pass
+        except Exception as exc:
+            print('CodePresenter encountered a problem in on_activated: %s' %
+                  exc)
+
+    @instrumented('on_post_save')
+    def on_post_save(self, view):
+        """ pick up changes saved to a source file that is being presented """
+        filename = view.file_name()
+        if filename is None:
+            return
+        try:
+            for project in list(CodePresenterProject.PROJECTS.values()):
+                if project.source is not None and\
+                        filename.startswith(os.path.join(project.source, '')):
+                    project.reload_source(filename)
+        except Exception as exc:
+            print('CodePresenter encountered a problem in on_post_save: %s' %
+                  exc)
+
+    @instrumented('on_load')
     def on_load(self, view):
         """ set up the proper cursor point once the file loads """
         try: